@@ -0,0 +1,98 @@
+import gzip
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест API фильмов на запущенном сервере: смесь запросов страниц списка и карточек, '
+            'перцентили задержки по каждому виду. Завершается с ошибкой, если p95 выше --target-p95.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/v1/movies/', help='адрес списка фильмов')
+        parser.add_argument('--requests', type=int, default=2000, help='всего запросов')
+        parser.add_argument('--concurrency', type=int, default=8, help='одновременных запросов')
+        parser.add_argument('--pages', type=int, default=20, help='страниц списка для прогрева и выборки')
+        parser.add_argument('--detail-share', type=float, default=0.7, help='доля запросов карточек')
+        parser.add_argument('--target-p95', type=float, default=20.0, help='допустимый p95, мс')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        base = options['url']
+        urls = {'list': [base], 'detail': []}
+
+        # обход первых страниц по курсорам даёт адреса страниц списка и карточек
+        cursor_url = base
+        for _ in range(options['pages']):
+            _, body = self.fetch(cursor_url)
+            page = json.loads(body)
+            urls['detail'].extend(f'{base}{film["id"]}/' for film in page['results'])
+            if not page['next']:
+                break
+            cursor_url = f'{base}?cursor={urllib.parse.quote(page["next"])}'
+            urls['list'].append(cursor_url)
+        if not urls['detail']:
+            raise CommandError(f'{base} не вернул ни одного фильма')
+
+        rng = random.Random(options['seed'])
+        plan = [
+            ('detail', rng.choice(urls['detail'])) if rng.random() < options['detail_share']
+            else ('list', rng.choice(urls['list']))
+            for _ in range(options['requests'])
+        ]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(self.timed, plan))
+        elapsed = time.perf_counter() - started
+
+        failed = [url for kind, url, latency in results if latency is None]
+        latencies = {}
+        for kind, _, latency in results:
+            if latency is not None:
+                latencies.setdefault(kind, []).append(latency)
+                latencies.setdefault('all', []).append(latency)
+
+        self.stdout.write(f'{len(results)} запросов за {elapsed:.1f} с, {len(results) / elapsed:.0f} rps, '
+                          f'ошибок: {len(failed)}')
+        for kind, values in latencies.items():
+            self.stdout.write(f'{kind:6} n={len(values):6} mean={statistics.mean(values):7.2f} '
+                              f'p50={percentile(values, 50):7.2f} p95={percentile(values, 95):7.2f} '
+                              f'p99={percentile(values, 99):7.2f} мс')
+
+        if failed:
+            raise CommandError(f'Ошибки в {len(failed)} запросах, например {failed[0]}')
+        p95 = percentile(latencies['all'], 95)
+        if p95 > options['target_p95']:
+            raise CommandError(f'p95 {p95:.2f} мс выше цели {options["target_p95"]} мс')
+
+    @staticmethod
+    def fetch(url: str):
+        request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            body = response.read()
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            return response.status, body
+
+    def timed(self, item):
+        kind, url = item
+        started = time.perf_counter()
+        try:
+            self.fetch(url)
+        except (urllib.error.URLError, OSError):
+            return kind, url, None
+        return kind, url, (time.perf_counter() - started) * 1000
@@ -0,0 +1,91 @@
+""" SQL, который собирает весь ответ API на стороне Postgres одним запросом.
+
+Фильмы выбираются подзапросом {films}, жанры и персоны каждого фильма агрегируются в JSON
+через LATERAL по индексам связующих таблиц. Версия строки для ETag - наибольший updated_at
+фильма, его жанров и персон плюс число связей, чтобы удаление связи тоже меняло ETag.
+"""
+
+FILM_PAGE = """
+    SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating, fw.type, fw.created_at, fw.updated_at
+    FROM content.film_work fw
+    {where}
+    ORDER BY fw.created_at DESC, fw.id DESC
+    LIMIT %(limit)s
+"""
+
+FILM_BY_ID = """
+    SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating, fw.type, fw.created_at, fw.updated_at
+    FROM content.film_work fw
+    WHERE fw.id = %(id)s
+"""
+
+AFTER_CURSOR = 'WHERE (fw.created_at, fw.id) < (%(created_at)s, %(id)s)'
+
+# created_at допускает NULL, а DESC в Postgres ставит NULL первыми: после строки без даты идут
+# остальные строки без даты с меньшим id и все строки с датой
+AFTER_NULL_CURSOR = 'WHERE fw.created_at IS NULL AND fw.id < %(id)s OR fw.created_at IS NOT NULL'
+
+FILM_ROWS = """
+    SELECT
+        json_build_object(
+            'id', films.id,
+            'title', films.title,
+            'description', films.description,
+            'creation_date', films.creation_date,
+            'rating', films.rating,
+            'type', films.type,
+            'genres', coalesce(genres.list, '[]'::json),
+            'persons', coalesce(persons.list, '{{}}'::json)
+        ) AS film,
+        concat_ws(':', films.id, greatest(films.updated_at, genres.updated_at, persons.updated_at),
+                  genres.links, persons.links) AS version,
+        films.created_at,
+        films.id
+    FROM ({films}) AS films
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object('id', g.id, 'name', g.name) ORDER BY g.name) AS list,
+               max(g.updated_at) AS updated_at,
+               count(*) AS links
+        FROM content.genre_film_work gfw
+        JOIN content.genre g ON g.id = gfw.genre_id
+        WHERE gfw.filmwork_id = films.id
+    ) AS genres ON true
+    LEFT JOIN LATERAL (
+        SELECT json_object_agg(roles.role, roles.list ORDER BY roles.role) AS list,
+               max(roles.updated_at) AS updated_at,
+               sum(roles.links) AS links
+        FROM (
+            SELECT pfw.role,
+                   json_agg(json_build_object('id', p.id, 'full_name', p.full_name) ORDER BY p.full_name) AS list,
+                   max(p.updated_at) AS updated_at,
+                   count(*) AS links
+            FROM content.person_film_work pfw
+            JOIN content.person p ON p.id = pfw.person_id
+            WHERE pfw.filmwork_id = films.id
+            GROUP BY pfw.role
+        ) AS roles
+    ) AS persons ON true
+"""
+
+# Одна строка: JSON страницы текстом (без разбора в psycopg2), ETag, ключ последней строки и число строк.
+# Последняя строка при DESC (NULL первыми) - первая при ASC (NULL последними)
+FILM_LIST = f"""
+    SELECT
+        coalesce(json_agg(film_rows.film ORDER BY film_rows.created_at DESC, film_rows.id DESC), '[]'::json)::text,
+        md5(coalesce(string_agg(film_rows.version, ',' ORDER BY film_rows.created_at DESC, film_rows.id DESC), '')),
+        (array_agg(film_rows.created_at ORDER BY film_rows.created_at, film_rows.id))[1],
+        (array_agg(film_rows.id ORDER BY film_rows.created_at, film_rows.id))[1],
+        count(*)
+    FROM ({FILM_ROWS}) AS film_rows
+"""
+
+FILM_DETAIL = f"""
+    SELECT film_rows.film::text, md5(film_rows.version)
+    FROM ({FILM_ROWS.format(films=FILM_BY_ID)}) AS film_rows
+"""
+
+
+def film_list_sql(after: bool, after_null: bool = False) -> str:
+    where = (AFTER_NULL_CURSOR if after_null else AFTER_CURSOR) if after else ''
+    films = FILM_PAGE.format(where=where)
+    return FILM_LIST.format(films=films)
@@ -0,0 +1,30 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from movies.models import FilmWork
+from movies.seed import seed_films, seed_genres, seed_persons
+
+
+class FilmListTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        films = seed_films(30, seed_genres(3), seed_persons(10))
+        # в db_schema.sql created_at допускает NULL; ALTER откатится вместе с транзакцией теста
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE content.film_work ALTER COLUMN created_at DROP NOT NULL')
+        FilmWork.objects.filter(pk__in=[film.pk for film in films[:7]]).update(created_at=None)
+
+    def test_cursor_walks_all_films(self):
+        expected = [str(pk) for pk in FilmWork.objects.order_by('-created_at', '-id').values_list('pk', flat=True)]
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 4, **({'cursor': cursor} if cursor else {})}
+            page = json.loads(self.client.get(reverse('film-list'), params).content)
+            seen += [film['id'] for film in page['results']]
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from api import views
+
+urlpatterns = [
+    path('v1/movies/', views.film_list, name='film-list'),
+    path('v1/movies/<uuid:film_id>/', views.film_detail, name='film-detail'),
+]
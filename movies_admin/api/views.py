@@ -0,0 +1,72 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime
+
+from django.db import connections, router
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         HttpResponseNotFound)
+from django.utils.cache import get_conditional_response
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+from api.queries import FILM_DETAIL, film_list_sql
+from movies.models import FilmWork
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+
+def encode_cursor(created_at: datetime, film_id) -> str:
+    """ Ключ последней строки страницы; у строки без created_at в курсоре пустая дата """
+    created_at = created_at.isoformat() if created_at is not None else ''
+    return base64.urlsafe_b64encode(f'{created_at}|{film_id}'.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    created_at, film_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at) if created_at else None, uuid.UUID(film_id)
+
+
+def json_response(request, body: str, etag: str) -> HttpResponse:
+    etag = f'"{etag}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+@gzip_page
+@require_safe
+def film_list(request):
+    """ Страница фильмов по убыванию (created_at, id); следующая страница - по курсору из поля next """
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        params = {'limit': limit}
+        cursor = request.GET.get('cursor')
+        if cursor:
+            params['created_at'], params['id'] = decode_cursor(cursor)
+    except (ValueError, binascii.Error):
+        return HttpResponseBadRequest('invalid limit or cursor')
+    if limit < 1:
+        return HttpResponseBadRequest('invalid limit or cursor')
+
+    with connections[router.db_for_read(FilmWork)].cursor() as db:
+        db.execute(film_list_sql(after=bool(cursor), after_null=params.get('created_at') is None), params)
+        results, etag, last_created_at, last_id, count = db.fetchone()
+
+    next_cursor = f'"{encode_cursor(last_created_at, last_id)}"' if count == limit else 'null'
+    return json_response(request, f'{{"next": {next_cursor}, "results": {results}}}', etag)
+
+
+@gzip_page
+@require_safe
+def film_detail(request, film_id):
+    with connections[router.db_for_read(FilmWork)].cursor() as db:
+        db.execute(FILM_DETAIL, {'id': film_id})
+        row = db.fetchone()
+    if row is None:
+        return HttpResponseNotFound('film not found')
+    return json_response(request, *row)
@@ -0,0 +1,83 @@
+""" Чтение с реплик и проверка постоянных соединений с Postgres.
+
+ReplicaRoutingMiddleware включает чтение с реплик только для GET/HEAD запросов. Первая запись в запросе
+(или транзакция на запись, которую открывает, например, форма админки) закрепляет все следующие
+чтения этого запроса за основной базой. После запроса с записью браузер ещё DATABASE_REPLICA_PIN_SECONDS
+секунд читает с основной базы, чтобы после сохранения и редиректа не увидеть отставшую реплику.
+Вне запросов (команды manage.py) всё идёт в основную базу.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, use_replicas: bool):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        self.replica = random.choice(replicas) if use_replicas and replicas else None
+        self.pinned = self.replica is None
+        self.wrote = False
+
+
+@contextmanager
+def read_from_replicas(enabled: bool = True):
+    """ Область, в которой чтения идут на одну случайно выбранную реплику до первой записи """
+    token = _state.set(RoutingState(enabled))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.pinned:
+            return PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики - физические копии основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def close_unusable_connections():
+    """ Проверка постоянных соединений: закрывает те, что оборвались между запросами """
+    for connection in connections.all():
+        if connection.connection is not None and not connection.in_atomic_block and not connection.is_usable():
+            connection.close()
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if getattr(settings, 'DATABASE_HEALTH_CHECKS', False):
+            close_unusable_connections()
+
+        use_replicas = request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+        with read_from_replicas(use_replicas) as state:
+            response = self.get_response(request)
+            if state.wrote or request.method not in SAFE_METHODS:
+                response.set_cookie(PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                                    httponly=True, samesite='Lax')
+        return response
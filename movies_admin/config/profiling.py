@@ -0,0 +1,197 @@
+""" Профилирование SQL по запросам и метрики в формате Prometheus.
+
+SqlProfilingMiddleware включается настройкой SQL_PROFILING. Через connection.execute_wrapper она
+считает для каждого запроса число SQL-запросов ко всем базам, их суммарное время, повторы одного и того же
+SQL (признак N+1) и самые долгие запросы. Время отдаётся в заголовке Server-Timing, запросы дольше
+SQL_PROFILING_SLOW_MS пишутся в лог. Гистограммы по шаблонам URL копятся в памяти процесса и отдаются
+на /metrics вместе со счётчиками query_cache. SQL, выполненный при отдаче StreamingHttpResponse
+(выгрузки), уже после ответа middleware, не учитывается.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from movies.cache import query_cache
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SLOWEST = 3
+UNMATCHED = 'unmatched'
+
+
+class QueryRecorder:
+    """ execute_wrapper одного запроса: соединения потоковые, поэтому блокировки не нужны """
+
+    def __init__(self, keep: int = SLOWEST):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            self.statements[sql] += 1
+            # куча из keep самых долгих запросов
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+    @property
+    def duplicates(self) -> int:
+        """ Сколько запросов повторяли уже выполненный SQL (параметры не сравниваются) """
+        return self.count - len(self.statements)
+
+    def top(self) -> list:
+        return sorted(self.slowest, reverse=True)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name: str, labels: str) -> list:
+        lines, total = [], 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {total}')
+        return lines
+
+
+def label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """ Гистограммы времени запроса, времени SQL и числа SQL-запросов по шаблону URL и методу """
+    histograms = (
+        ('django_request_duration_seconds', 'Время обработки запроса', DURATION_BUCKETS),
+        ('django_request_sql_duration_seconds', 'Суммарное время SQL за запрос', DURATION_BUCKETS),
+        ('django_request_queries', 'Число SQL-запросов за запрос', QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._responses = Counter()
+        self._duplicates = Counter()
+
+    def observe(self, route: str, method: str, status: int, duration: float, recorder: QueryRecorder):
+        key = (route, method)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [Histogram(buckets) for _, _, buckets in self.histograms]
+            for histogram, value in zip(series, (duration, recorder.duration, recorder.count)):
+                histogram.observe(value)
+            self._responses[(route, method, status)] += 1
+            self._duplicates[key] += recorder.duplicates
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for index, (name, description, _) in enumerate(self.histograms):
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (route, method), series in self._series.items():
+                    lines += series[index].lines(name, f'route="{label(route)}",method="{method}"')
+
+            lines += ['# HELP django_requests_total Ответы по шаблону URL, методу и статусу',
+                      '# TYPE django_requests_total counter']
+            lines += [f'django_requests_total{{route="{label(route)}",method="{method}",status="{status}"}} {count}'
+                      for (route, method, status), count in self._responses.items()]
+
+            lines += ['# HELP django_request_duplicate_queries_total Повторы уже выполненного в запросе SQL',
+                      '# TYPE django_request_duplicate_queries_total counter']
+            lines += [f'django_request_duplicate_queries_total{{route="{label(route)}",method="{method}"}} {count}'
+                      for (route, method), count in self._duplicates.items()]
+
+        lines += ['# HELP movies_query_cache_requests_total Обращения к query_cache',
+                  '# TYPE movies_query_cache_requests_total counter']
+        for kind, counts in query_cache.stats().items():
+            lines += [f'movies_query_cache_requests_total{{kind="{label(kind)}",result="{result}"}} {count}'
+                      for result, count in counts.items()]
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+class SqlProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow = settings.SQL_PROFILING_SLOW_MS / 1000
+        self.server_timing = settings.SQL_PROFILING_SERVER_TIMING
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None and match.route else UNMATCHED
+        request_metrics.observe(route, request.method, response.status_code, duration, recorder)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;desc="{recorder.count} SQL";dur={recorder.duration * 1000:.1f}, '
+                f'app;dur={(duration - recorder.duration) * 1000:.1f}, total;dur={duration * 1000:.1f}'
+            )
+        if duration >= self.slow:
+            self.log_slow(request, duration, recorder)
+        return response
+
+    @staticmethod
+    def log_slow(request, duration: float, recorder: QueryRecorder):
+        repeated = [f'{count}x {sql[:200]}' for sql, count in recorder.statements.most_common(3) if count > 1]
+        slowest = [f'{elapsed * 1000:.1f} мс {sql[:200]}' for elapsed, sql in recorder.top()]
+        logger.warning(
+            'Медленный запрос %s %s: %.0f мс, SQL: %s запросов за %.0f мс, повторов %s\n'
+            'самые долгие:\n  %s\nповторы:\n  %s',
+            request.method, request.get_full_path(), duration * 1000, recorder.count, recorder.duration * 1000,
+            recorder.duplicates, '\n  '.join(slowest) or '-', '\n  '.join(repeated) or '-',
+        )
+
+
+@never_cache
+@require_safe
+def metrics(request):
+    if not getattr(settings, 'SQL_PROFILING', False):
+        raise Http404
+    allowed = settings.SQL_PROFILING_METRICS_IPS
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -21,11 +21,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'movies.apps.MoviesConfig'
+    'django.contrib.postgres',
+    'movies.apps.MoviesConfig',
+    'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
+    'config.profiling.SqlProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'config.db.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,12 +67,44 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST'),
         'PORT': env('DB_PORT'),
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=60),
         'OPTIONS': {
            'options': '-c search_path=public,content'
         }
     }
 }
 
+# реплики: DB_REPLICA_HOSTS=replica1:5432,replica2 - те же база, пользователь и пароль, что у default
+for index, replica in enumerate(env.list('DB_REPLICA_HOSTS', default=[])):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['config.db.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = env.int('DB_REPLICA_PIN_SECONDS', default=5)
+# в Django 3.2 нет CONN_HEALTH_CHECKS, проверку делает config.db.ReplicaRoutingMiddleware
+DATABASE_HEALTH_CHECKS = env.bool('DB_HEALTH_CHECKS', default=True)
+
+
+# locmemcache:// по умолчанию; filecache:///var/tmp/movies_cache - общий кеш для нескольких процессов
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
+# профилирование SQL по запросам и метрики Prometheus на /metrics (config.profiling)
+SQL_PROFILING = env.bool('SQL_PROFILING', default=False)
+SQL_PROFILING_SLOW_MS = env.int('SQL_PROFILING_SLOW_MS', default=500)
+SQL_PROFILING_SERVER_TIMING = env.bool('SQL_PROFILING_SERVER_TIMING', default=True)
+# пустой список - /metrics доступен с любого адреса
+SQL_PROFILING_METRICS_IPS = env.list('SQL_PROFILING_METRICS_IPS', default=['127.0.0.1'])
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -1,6 +1,13 @@
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from config.profiling import metrics
+from movies.autocomplete import CachedAutocompleteJsonView
 
 urlpatterns = [
+    # перекрывает стандартный admin/autocomplete/, поэтому стоит раньше admin.site.urls
+    path('admin/autocomplete/', admin.site.admin_view(CachedAutocompleteJsonView.as_view(admin_site=admin.site))),
     path('admin/', admin.site.urls),
+    path('api/', include('api.urls')),
+    path('metrics', metrics),
 ]
@@ -1,24 +1,115 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
 
-from movies.models import (FilmWork, FilmWorkGenre, FilmWorkPerson, Genre,
-                           Person)
+from movies.export import FilmExport
+from movies.filters import CachedRelatedFieldListFilter
+from movies.models import (FilmCatalogue, FilmWork, FilmWorkGenre,
+                           FilmWorkPerson, Genre, Person)
+from movies.paginator import EstimatedCountPaginator
+from movies.search import (SearchAdminMixin, SearchChangeList, film_search,
+                           genre_prefix_search, person_prefix_search,
+                           person_search)
+from movies.widgets import PrefilledAutocompleteSelect
 
 
-class FilmWorkPersonInline(admin.TabularInline):
+class IndexedOrderingChangeList(SearchChangeList):
+    """ Сортировка только по полю из indexed_ordering_fields досортировывается по id в ту же сторону.
+
+    Иначе к полю добавляется ordering админки (-created_at, -id), и индекс (поле, id) не подходит.
+    Наследует SearchChangeList: LargeTableAdminMixin стоит в админках раньше SearchAdminMixin,
+    и результаты поиска должны остаться отсортированы по релевантности.
+    """
+
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        field = ordering[0] if ordering else None
+        chosen = self.params.get(ORDER_VAR, '').split('.')
+        if (len(chosen) == 1 and isinstance(field, str)
+                and field.lstrip('-') in self.model_admin.indexed_ordering_fields):
+            return [field, '-pk' if field.startswith('-') else 'pk']
+        # ChangeList добавляет к ordering админки ещё и order_by queryset, то есть те же поля второй раз
+        seen = set()
+        unique = []
+        for field in ordering:
+            if isinstance(field, str):
+                if field in seen:
+                    continue
+                seen.add(field)
+            unique.append(field)
+        return unique
+
+
+class LargeTableAdminMixin:
+    """ Оценка числа строк вместо COUNT(*) и keyset-пагинация по (created_at, id) """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-created_at', '-id')
+    # поля с индексом (поле, id)
+    indexed_ordering_fields = ()
+
+    def get_changelist(self, request, **kwargs):
+        return IndexedOrderingChangeList
+
+
+class AutocompleteInlineMixin:
+    """ autocomplete-поля вместо <select> со всеми строками связанной таблицы.
+
+    Подписи выбранных значений берутся из связанных объектов, уже загруженных get_queryset
+    через select_related, поэтому страница не делает запрос на каждую строку inline.
+    """
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if 'widget' not in kwargs and db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = PrefilledAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        fields = self.get_autocomplete_fields(request)
+
+        class PrefilledFormSet(formset):
+            def add_fields(self, form, index):
+                super().add_fields(form, index)
+                for name in fields:
+                    related = form.instance._meta.get_field(name).get_cached_value(form.instance, None)
+                    if related is None or name not in form.fields:
+                        continue
+                    widget = form.fields[name].widget
+                    widget = getattr(widget, 'widget', widget)
+                    if isinstance(widget, PrefilledAutocompleteSelect):
+                        widget.labels = {str(related.pk): str(related)}
+
+        return PrefilledFormSet
+
+
+class FilmWorkPersonInline(AutocompleteInlineMixin, admin.TabularInline):
     model = FilmWorkPerson
     extra = 0
+    autocomplete_fields = ('person',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('person')
 
 
-class FilmworkGenreInline(admin.TabularInline):
+class FilmworkGenreInline(AutocompleteInlineMixin, admin.TabularInline):
     model = FilmWorkGenre
     extra = 0
+    autocomplete_fields = ('genre',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('genre')
 
 
 @admin.register(FilmWork)
-class FilmWorkAdmin(admin.ModelAdmin):
-    list_display = ('title', 'creation_date', 'rating', 'created_at', 'updated_at', 'type')
-    list_filter = ('type',)
-    search_fields = ('title', 'description', 'id')
+class FilmWorkAdmin(LargeTableAdminMixin, SearchAdminMixin, admin.ModelAdmin):
+    list_display = ('title', 'creation_date', 'rating', 'created_at', 'updated_at', 'type', 'genres_list',
+                    'persons_list')
+    list_filter = ('type', ('genres', CachedRelatedFieldListFilter))
+    search_fields = ('title', 'description')
+    search_function = staticmethod(film_search)
     fields = ('title', 'type', 'description', 'creation_date', 'certificate', 'file_path', 'rating')
 
     inlines = [
@@ -26,16 +117,88 @@ class FilmWorkAdmin(admin.ModelAdmin):
         FilmworkGenreInline,
     ]
 
+    actions = ['export_csv', 'export_ndjson']
+
+    def get_queryset(self, request):
+        # жанры и персоны всей страницы списка подгружаются двумя запросами, независимо от числа строк
+        return super().get_queryset(request).prefetch_related(
+            'genres',
+            Prefetch('filmworkperson_set', queryset=FilmWorkPerson.objects.select_related('person')),
+        )
+
+    @admin.display(description=_('genres'))
+    def genres_list(self, obj):
+        return ', '.join(genre.name for genre in obj.genres.all())
+
+    @admin.display(description=_('persons'))
+    def persons_list(self, obj):
+        return ', '.join(credit.person.full_name for credit in obj.filmworkperson_set.all())
+
+    def export(self, queryset, fmt: str):
+        export = FilmExport(fmt, queryset)
+        response = StreamingHttpResponse(export.chunks(), content_type=export.content_type)
+        response['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+        return response
+
+    @admin.action(description=_('Export selected filmworks to CSV'))
+    def export_csv(self, request, queryset):
+        return self.export(queryset, 'csv')
+
+    @admin.action(description=_('Export selected filmworks to NDJSON'))
+    def export_ndjson(self, request, queryset):
+        return self.export(queryset, 'ndjson')
+
 
 @admin.register(Genre)
-class GenreAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description', 'created_at', 'updated_at')
-    search_fields = ('id', 'name', 'description')
-    fields = ('name', 'description')
+class GenreAdmin(LargeTableAdminMixin, SearchAdminMixin, admin.ModelAdmin):
+    # индексы (счётчик, id) из миграции 0006_counters
+    indexed_ordering_fields = ('film_count',)
+    list_display = ('name', 'description', 'film_count', 'created_at', 'updated_at')
+    search_fields = ('name', 'description')
+    autocomplete_function = staticmethod(genre_prefix_search)
+    fields = ('name', 'description', 'film_count')
+    readonly_fields = ('film_count',)
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
-    list_display = ('full_name', 'birth_date', 'created_at', 'updated_at')
-    search_fields = ('id', 'full_name', 'birth_date')
-    fields = ('full_name', 'birth_date')
+class PersonAdmin(LargeTableAdminMixin, SearchAdminMixin, admin.ModelAdmin):
+    # индексы (счётчик, id) из миграции 0006_counters
+    indexed_ordering_fields = ('film_count', 'director_count', 'writer_count', 'actor_count')
+    list_display = ('full_name', 'birth_date', 'film_count', 'director_count', 'writer_count', 'actor_count',
+                    'created_at', 'updated_at')
+    search_fields = ('full_name',)
+    date_search_fields = ('birth_date',)
+    search_function = staticmethod(person_search)
+    autocomplete_function = staticmethod(person_prefix_search)
+    fields = ('full_name', 'birth_date', 'film_count', 'director_count', 'writer_count', 'actor_count')
+    readonly_fields = ('film_count', 'director_count', 'writer_count', 'actor_count')
+
+
+@admin.register(FilmCatalogue)
+class FilmCatalogueAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """ Просмотр материализованного представления: одна строка на фильм, без join """
+    list_display = ('title', 'type', 'rating', 'creation_date', 'genres_list', 'directors_list', 'actors_list')
+    list_filter = ('type',)
+    # icontains идёт по индексу UPPER(title) gin_trgm_ops из миграции 0005_film_catalogue
+    search_fields = ('title',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description=_('genres'))
+    def genres_list(self, obj):
+        return ', '.join(obj.genres)
+
+    @admin.display(description=_('directors'))
+    def directors_list(self, obj):
+        return ', '.join(obj.directors)
+
+    @admin.display(description=_('actors'))
+    def actors_list(self, obj):
+        return ', '.join(obj.actors)
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import pre_migrate
+
+
+def create_content_schema(using, **kwargs):
+    # таблицы моделей лежат в схеме content; на пустой базе (например, тестовой у manage.py test)
+    # её ещё нет, а db_schema.sql туда не применяли
+    with connections[using].cursor() as cursor:
+        cursor.execute('CREATE SCHEMA IF NOT EXISTS content')
 
 
 class MoviesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movies'
+
+    def ready(self):
+        from movies import signals
+        signals.connect()
+        pre_migrate.connect(create_content_schema, sender=self, dispatch_uid='movies_content_schema')
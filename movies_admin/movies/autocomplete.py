@@ -0,0 +1,62 @@
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse
+
+from movies.cache import query_cache
+
+
+class CachedAutocompleteJsonView(AutocompleteJsonView):
+    """ Поиск для autocomplete-полей админки.
+
+    Права проверяются на каждый запрос, а готовый ответ кешируется на cache_timeout секунд
+    или до изменения модели, в которой идёт поиск.
+    Если у ModelAdmin есть autocomplete_function (staticmethod), поиск идёт через неё,
+    иначе - через обычный get_search_results. Вместо COUNT(*) для пагинации выбирается
+    на одну строку больше страницы.
+    """
+    cache_timeout = 30
+
+    def get(self, request, *args, **kwargs):
+        self.term, self.model_admin, self.source_field, to_field_name = self.process_request(request)
+        if not self.has_perm(request):
+            raise PermissionDenied
+
+        page = self.page_number(request)
+
+        def search():
+            offset = (page - 1) * self.paginate_by
+            rows = list(self.get_queryset()[offset:offset + self.paginate_by + 1])
+            return {
+                'results': [
+                    {'id': str(getattr(obj, to_field_name)), 'text': str(obj)}
+                    for obj in rows[:self.paginate_by]
+                ],
+                'pagination': {'more': len(rows) > self.paginate_by},
+            }
+
+        data = query_cache.get(self.cache_key(page), search, models=(self.model_admin.model,),
+                               timeout=self.cache_timeout)
+        return JsonResponse(data)
+
+    def get_queryset(self):
+        search = getattr(self.model_admin, 'autocomplete_function', None)
+        term = self.term.strip()
+        if search is None or not term:
+            return super().get_queryset()
+        queryset = self.model_admin.get_queryset(self.request)
+        queryset = queryset.complex_filter(self.source_field.get_limit_choices_to())
+        return search(queryset, term)
+
+    @staticmethod
+    def page_number(request) -> int:
+        try:
+            page = int(request.GET.get('page') or 1)
+        except ValueError:
+            raise Http404
+        if page < 1:
+            raise Http404
+        return page
+
+    def cache_key(self, page: int) -> str:
+        opts = self.source_field.model._meta
+        return f'autocomplete:{opts.label_lower}.{self.source_field.name}:{page}:{self.term}'
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+_MISSING = object()
+
+
+def query_models(queryset) -> tuple:
+    """ Модели всех таблиц, которые участвуют в запросе: от них зависит его результат """
+    tables = {join.table_name for join in queryset.query.alias_map.values()}
+    models = {queryset.model}
+    models.update(model for model in apps.get_models() if model._meta.db_table in tables)
+    return tuple(models)
+
+
+class QueryCache:
+    """ Кеш запросов поверх кеша Django с точной инвалидацией по моделям.
+
+    Каждое значение сохраняется под ключом, в который входят версии моделей из models.
+    invalidate(model) меняет версию модели, и все значения, зависящие от неё, больше не находятся;
+    остальные значения остаются в кеше. Версии вызываются сигналами из movies.signals.
+    Работает с любым бэкендом, в том числе locmem и file. Счётчики попаданий и промахов ведутся в процессе.
+    """
+
+    def __init__(self, alias: str = DEFAULT_CACHE_ALIAS, prefix: str = 'movies', timeout: int = 300):
+        self.alias = alias
+        self.prefix = prefix
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, model) -> str:
+        return f'{self.prefix}:version:{model._meta.label_lower}'
+
+    def versions(self, models) -> str:
+        keys = [self.version_key(model) for model in sorted(models, key=lambda model: model._meta.label_lower)]
+        found = self.cache.get_many(keys)
+        for key in keys:
+            if key not in found:
+                # версия без срока жизни; если кеш её вытеснил, новая версия не совпадёт ни с одной прежней
+                self.cache.add(key, time.time_ns(), None)
+                found[key] = self.cache.get(key)
+        return ':'.join(str(found[key]) for key in keys)
+
+    def key(self, name: str, models) -> str:
+        digest = hashlib.md5(f'{name}:{self.versions(models)}'.encode()).hexdigest()
+        return f'{self.prefix}:{name.split(":", 1)[0]}:{digest}'
+
+    def get(self, name: str, compute, models, timeout: int = None):
+        """ Значение из кеша или compute(), сохранённый до изменения любой из models """
+        key = self.key(name, models)
+        value = self.cache.get(key, _MISSING)
+        kind = name.split(':', 1)[0]
+        if value is not _MISSING:
+            self._count(kind, 'hits')
+            return value
+
+        self._count(kind, 'misses')
+        value = compute()
+        self.cache.set(key, value, self.timeout if timeout is None else timeout)
+        return value
+
+    def set(self, name: str, value, models, timeout: int = None):
+        self.cache.set(self.key(name, models), value, self.timeout if timeout is None else timeout)
+
+    def lookup(self, name: str, models, default=None):
+        value = self.cache.get(self.key(name, models), _MISSING)
+        self._count(name.split(':', 1)[0], 'misses' if value is _MISSING else 'hits')
+        return default if value is _MISSING else value
+
+    def invalidate(self, model):
+        self.cache.set(self.version_key(model), time.time_ns(), None)
+
+    def _count(self, kind: str, result: str):
+        with self._lock:
+            self._stats[(kind, result)] += 1
+
+    def stats(self) -> dict:
+        """ {kind: {'hits': n, 'misses': n}}, где kind - часть имени до первого двоеточия """
+        with self._lock:
+            items = list(self._stats.items())
+        result = {}
+        for (kind, outcome), count in items:
+            result.setdefault(kind, {'hits': 0, 'misses': 0})[outcome] = count
+        return result
+
+
+query_cache = QueryCache()
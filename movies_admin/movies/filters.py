@@ -0,0 +1,15 @@
+from django.contrib.admin import RelatedFieldListFilter
+
+from movies.cache import query_cache
+
+
+class CachedRelatedFieldListFilter(RelatedFieldListFilter):
+    """ Варианты фильтра по связанной модели читаются из кеша до изменения этой модели """
+
+    def field_choices(self, field, request, model_admin):
+        choices = super().field_choices
+        return query_cache.get(
+            f'choices:{field.model._meta.label_lower}.{field.name}',
+            lambda: list(choices(field, request, model_admin)),
+            models=(field.related_model,),
+        )
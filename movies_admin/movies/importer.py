@@ -0,0 +1,188 @@
+import csv
+import json
+import logging
+import time
+import uuid
+from datetime import date
+from itertools import islice
+from pathlib import Path
+
+from django.db import transaction
+
+from movies.export import LIST_SEPARATOR
+from movies.models import (FilmWork, FilmWorkGenre, FilmWorkPerson, Genre,
+                           Person)
+
+logger = logging.getLogger(__name__)
+
+ROLE_COLUMNS = {'directors': FilmWorkPerson.Role.DIRECTOR, 'writers': FilmWorkPerson.Role.WRITER,
+                'actors': FilmWorkPerson.Role.ACTOR}
+
+
+def read_feed(path: str):
+    """ Записи CSV (с заголовком) или NDJSON как словари; формат по расширению файла """
+    with open(path, encoding='utf-8', newline='') as file:
+        if Path(path).suffix.lower() in ('.ndjson', '.jsonl'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def chunked(records, size: int):
+    records = iter(records)
+    chunk = list(islice(records, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(records, size))
+
+
+def as_list(value) -> list:
+    """ Список имён: в NDJSON - массив, в CSV - строка через LIST_SEPARATOR, как в export_films """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(LIST_SEPARATOR)
+    return [name.strip() for name in value if name and name.strip()]
+
+
+def as_uuid(value):
+    return uuid.UUID(str(value)) if value else None
+
+
+def as_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def as_float(value):
+    return float(value) if value not in (None, '') else None
+
+
+class FeedImporter:
+    """ Импорт фильмов, персон и связей через bulk_create порциями.
+
+    Жанры и персоны ищутся по имени в словарях, загруженных из базы один раз; отсутствующие
+    создаются в той же порции. Каждая порция пишется в своей транзакции. Фильмы и персоны с уже
+    существующим id пропускаются, связи, которые уже есть в базе, не дублируются; в counts попадают
+    только действительно вставленные строки.
+    bulk_create не шлёт сигналов, поэтому после импорта нужно сбросить кеш (invalidate_all).
+    """
+
+    def __init__(self, batch_size: int = 5000):
+        self.batch_size = batch_size
+        self.genres = dict(Genre.objects.values_list('name', 'id'))
+        # у однофамильцев берётся первый найденный id
+        self.persons = {}
+        for full_name, pk in Person.objects.values_list('full_name', 'id').iterator(chunk_size=10000):
+            self.persons.setdefault(full_name, pk)
+        self.counts = {'films': 0, 'persons': 0, 'genres': 0, 'film_genres': 0, 'credits': 0}
+        self.elapsed = 0.0
+
+    def import_films(self, records):
+        for chunk in self.chunks(records):
+            films, film_genres, credits = [], [], []
+            for record in chunk:
+                film = FilmWork(
+                    id=as_uuid(record.get('id')) or uuid.uuid4(),
+                    title=record['title'],
+                    description=record.get('description') or '',
+                    creation_date=as_date(record.get('creation_date')),
+                    rating=as_float(record.get('rating')),
+                    type=record.get('type') or FilmWork.FilmWorkType.MOVIE,
+                    certificate=record.get('certificate') or '',
+                    file_path=record.get('file_path') or '',
+                )
+                films.append(film)
+                film_genres.extend((film.id, name) for name in as_list(record.get('genres')))
+                for column, role in ROLE_COLUMNS.items():
+                    credits.extend((film.id, name, role) for name in as_list(record.get(column)))
+            self.write(films=films, film_genres=film_genres, credits=credits)
+
+    def import_persons(self, records):
+        for chunk in self.chunks(records):
+            persons = []
+            for record in chunk:
+                person = Person(id=as_uuid(record.get('id')) or uuid.uuid4(), full_name=record['full_name'],
+                                birth_date=as_date(record.get('birth_date')))
+                self.persons.setdefault(person.full_name, person.id)
+                persons.append(person)
+            self.write(persons=persons)
+
+    def import_credits(self, records):
+        """ Записи вида {film_id, person_id или full_name, role} """
+        for chunk in self.chunks(records):
+            credits = []
+            for record in chunk:
+                person = as_uuid(record.get('person_id')) or record['full_name']
+                credits.append((as_uuid(record['film_id']), person, record.get('role') or FilmWorkPerson.Role.ACTOR))
+            self.write(credits=credits)
+
+    def chunks(self, records):
+        for chunk in chunked(records, self.batch_size):
+            started = time.perf_counter()
+            yield chunk
+            self.elapsed += time.perf_counter() - started
+            logger.info('Обработано: %s, %.0f записей/с', self.counts, self.rate())
+
+    def rate(self) -> float:
+        return sum(self.counts.values()) / self.elapsed if self.elapsed else 0.0
+
+    @transaction.atomic
+    def write(self, films=(), persons=(), film_genres=(), credits=()):
+        """ Одна порция в одной транзакции; связи ссылаются на жанры и персон по имени или по id """
+        new_genres = self.resolve(self.genres, (name for _, name in film_genres),
+                                  lambda pk, name: Genre(id=pk, name=name))
+        new_persons = self.resolve(self.persons, (person for _, person, _ in credits if isinstance(person, str)),
+                                   lambda pk, name: Person(id=pk, full_name=name, birth_date=None))
+
+        self.count('genres', Genre.objects.bulk_create(new_genres, batch_size=self.batch_size))
+        # ignore_conflicts - на случай параллельного импорта тех же id между проверкой и вставкой
+        self.count('persons', Person.objects.bulk_create(self.missing(Person, [*persons, *new_persons]),
+                                                         batch_size=self.batch_size, ignore_conflicts=True))
+        self.count('films', FilmWork.objects.bulk_create(self.missing(FilmWork, films),
+                                                         batch_size=self.batch_size, ignore_conflicts=True))
+
+        genre_links = {(film_id, self.genres[name]) for film_id, name in film_genres}
+        credit_links = {
+            (film_id, self.persons[person] if isinstance(person, str) else person, role)
+            for film_id, person, role in credits
+        }
+        film_ids = {link[0] for link in genre_links | credit_links}
+        if genre_links:
+            genre_links -= set(FilmWorkGenre.objects.filter(filmwork_id__in=film_ids)
+                               .values_list('filmwork_id', 'genre_id'))
+            self.count('film_genres', FilmWorkGenre.objects.bulk_create(
+                [FilmWorkGenre(filmwork_id=film_id, genre_id=genre_id) for film_id, genre_id in genre_links],
+                batch_size=self.batch_size,
+            ))
+        if credit_links:
+            credit_links -= set(FilmWorkPerson.objects.filter(filmwork_id__in=film_ids)
+                                .values_list('filmwork_id', 'person_id', 'role'))
+            self.count('credits', FilmWorkPerson.objects.bulk_create(
+                [FilmWorkPerson(filmwork_id=film_id, person_id=person_id, role=role)
+                 for film_id, person_id, role in credit_links],
+                batch_size=self.batch_size,
+            ))
+
+    @staticmethod
+    def missing(model, objects) -> list:
+        """ Объекты, чьих id нет в базе; из повторов id внутри порции остаётся первый """
+        unique = {}
+        for obj in objects:
+            unique.setdefault(obj.pk, obj)
+        existing = set(model.objects.filter(pk__in=list(unique)).values_list('pk', flat=True))
+        return [obj for pk, obj in unique.items() if pk not in existing]
+
+    @staticmethod
+    def resolve(known: dict, names, build) -> list:
+        """ Создаёт объекты для имён, которых нет в known, и сразу добавляет их в known """
+        created = []
+        for name in names:
+            if name not in known:
+                known[name] = uuid.uuid4()
+                created.append(build(known[name], name))
+        return created
+
+    def count(self, name: str, objects: list):
+        self.counts[name] += len(objects)
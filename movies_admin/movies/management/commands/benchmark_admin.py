@@ -0,0 +1,215 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from movies.models import FilmWork, Genre, Person
+from movies.seed import seed_films, seed_genres, seed_persons
+from movies.signals import invalidate_all
+
+LARGE_TABLES = """
+SELECT c.relname, c.reltuples::bigint
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'content' AND c.relkind IN ('r', 'm') AND c.reltuples >= %s
+"""
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def seq_scans(plan: dict) -> set:
+    """ Таблицы, которые план читает последовательным сканированием """
+    found = {plan['Relation Name']} if plan.get('Node Type') == 'Seq Scan' else set()
+    for child in plan.get('Plans', ()):
+        found |= seq_scans(child)
+    return found
+
+
+class Command(BaseCommand):
+    help = ('Бенчмарк страниц админки: p50/p95 и число SQL-запросов списков, поиска, фильтров и форм '
+            'FilmWork/Person/Genre через тестовый клиент, EXPLAIN главного запроса каждой страницы. '
+            'Завершается с ошибкой, если главный запрос читает большую таблицу последовательным сканированием.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help='сначала добавить данные в объёмах ниже')
+        parser.add_argument('--films', type=int, default=100000)
+        parser.add_argument('--persons', type=int, default=50000)
+        parser.add_argument('--genres', type=int, default=50)
+        parser.add_argument('--credits-per-film', type=int, default=6)
+        parser.add_argument('--iterations', type=int, default=20, help='замеров на страницу')
+        parser.add_argument('--large-rows', type=int, default=10000,
+                            help='таблица считается большой начиная с этого числа строк')
+        parser.add_argument('--output', default='admin_benchmark.json', help='куда сохранить результаты')
+        parser.add_argument('--compare', default=None, help='файл прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options)
+
+        user, _ = get_user_model().objects.get_or_create(
+            username='admin-benchmark', defaults={'is_staff': True, 'is_superuser': True})
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                client = Client()
+                client.force_login(user)
+                large = self.large_tables(options['large_rows'])
+                results = {name: self.measure(client, url, options['iterations'], large)
+                           for name, url in self.views()}
+        finally:
+            user.delete()
+
+        report = {
+            'commit': git_commit(),
+            'created': datetime.now(timezone.utc).isoformat(),
+            'iterations': options['iterations'],
+            'tables': large,
+            'views': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+        self.print_report(report, options['compare'])
+        failed = [name for name, result in results.items() if result['seq_scans'] or result['status'] != 200]
+        if failed:
+            raise CommandError(f'Страницы с ошибкой или seq scan большой таблицы: {", ".join(failed)}')
+
+    def seed(self, options):
+        rng = random.Random(0)
+        started = time.perf_counter()
+        genres = seed_genres(options['genres'], rng)
+        persons = seed_persons(options['persons'], rng)
+        chunk = 20000
+        for start in range(0, options['films'], chunk):
+            seed_films(min(chunk, options['films'] - start), genres, persons, options['credits_per_film'], rng=rng)
+        with connections['default'].cursor() as cursor:
+            cursor.execute('ANALYZE content.film_work, content.person, content.genre, '
+                           'content.person_film_work, content.genre_film_work')
+        invalidate_all()
+        self.stdout.write(f'Данные добавлены за {time.perf_counter() - started:.1f} с')
+
+    def views(self) -> list:
+        film = FilmWork.objects.order_by('-created_at').first()
+        person = Person.objects.order_by('-created_at').first()
+        genre = Genre.objects.order_by('-created_at').first()
+        if film is None or person is None or genre is None:
+            raise CommandError('Нет данных для бенчмарка, запустите с --seed')
+
+        # страница за порогом keyset-пагинации, но не последняя (номер подходит и при нумерации с 0)
+        deep_page = max(1, min(50, FilmWork.objects.count() // admin.site._registry[FilmWork].list_per_page - 2))
+        films = reverse('admin:movies_filmwork_changelist')
+        persons = reverse('admin:movies_person_changelist')
+        genres = reverse('admin:movies_genre_changelist')
+        return [
+            ('filmwork changelist', films),
+            ('filmwork deep page', f'{films}?p={deep_page}'),
+            ('filmwork search', f'{films}?q={film.title.split()[0]}'),
+            ('filmwork filter type', f'{films}?type__exact={FilmWork.FilmWorkType.MOVIE}'),
+            ('filmwork filter genre', f'{films}?genres__id__exact={genre.pk}'),
+            ('filmwork change form', reverse('admin:movies_filmwork_change', args=[film.pk])),
+            ('person changelist', persons),
+            ('person search', f'{persons}?q={person.full_name.split()[0]}'),
+            ('person change form', reverse('admin:movies_person_change', args=[person.pk])),
+            ('genre changelist', genres),
+            ('genre search', f'{genres}?q={genre.name.split()[0]}'),
+            ('genre change form', reverse('admin:movies_genre_change', args=[genre.pk])),
+            ('person autocomplete', f'{reverse("admin:autocomplete")}?app_label=movies&model_name=filmworkperson'
+                                    f'&field_name=person&term={person.full_name[:2]}'),
+        ]
+
+    @staticmethod
+    def large_tables(rows: int) -> dict:
+        with connections['default'].cursor() as cursor:
+            cursor.execute(LARGE_TABLES, [rows])
+            return dict(cursor.fetchall())
+
+    def measure(self, client, url: str, iterations: int, large: dict) -> dict:
+        # первый запрос - с холодным кешем: по нему считаются запросы и снимаются планы
+        invalidate_all()
+        response, queries = self.capture(client, url)
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        _, warm = self.capture(client, url)
+
+        main = self.main_query(queries)
+        plan = self.explain(*main) if main else None
+        scans = sorted(seq_scans(plan) & set(large)) if plan else []
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': len(queries),
+            'queries_warm': len(warm),
+            'main_query': main[1]['sql'] if main else None,
+            'main_plan': plan['Node Type'] if plan else None,
+            'seq_scans': scans,
+        }
+
+    @staticmethod
+    def capture(client, url: str):
+        """ Ответ и запросы ко всем базам, включая реплики: [(alias, запрос)] """
+        with ExitStack() as stack:
+            captured = {alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                        for alias in settings.DATABASES}
+            response = client.get(url)
+        return response, [(alias, query) for alias, context in captured.items() for query in context.captured_queries]
+
+    @staticmethod
+    def main_query(queries: list):
+        """ Самый долгий SELECT страницы """
+        selects = [(alias, query) for alias, query in queries if query['sql'].lstrip().upper().startswith('SELECT')]
+        return max(selects, key=lambda item: float(item[1]['time']), default=None)
+
+    @staticmethod
+    def explain(alias: str, query: dict) -> dict:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {query["sql"]}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def print_report(self, report: dict, compare: str = None):
+        base = {}
+        if compare:
+            with open(compare, encoding='utf-8') as file:
+                base_report = json.load(file)
+            base = base_report['views']
+            self.stdout.write(f'base: {compare} ({base_report.get("commit")}), new: {report["commit"]}')
+
+        self.stdout.write(f'{"view":<24} {"p50 ms":>8} {"p95 ms":>8} {"SQL":>4} {"warm":>4} {"base p95":>9} '
+                          f'{"change":>8}  seq scan')
+        for name, result in report['views'].items():
+            before = base.get(name, {}).get('p95_ms')
+            change = f'{(result["p95_ms"] - before) / before * 100:+.1f}%' if before else '-'
+            self.stdout.write(f'{name:<24} {result["p50_ms"]:>8} {result["p95_ms"]:>8} {result["queries"]:>4} '
+                              f'{result["queries_warm"]:>4} {before or "-":>9} {change:>8}  '
+                              f'{", ".join(result["seq_scans"]) or "-"}')
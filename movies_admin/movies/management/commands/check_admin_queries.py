@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from movies.query_counts import compare_query_counts
+
+
+class Command(BaseCommand):
+    help = ('Проверяет, что число SQL-запросов страниц админки не растёт вместе с числом строк. '
+            'Данные создаются в транзакции и откатываются. Те же замеры выполняет manage.py test movies.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=5, help='строк на странице в первом замере')
+        parser.add_argument('--large', type=int, default=40, help='строк на странице во втором замере')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = compare_query_counts(options['small'], options['large'])
+            transaction.set_rollback(True)
+
+        failures = []
+        for name, (before, after) in counts.items():
+            status = 'OK' if before == after else 'FAIL'
+            self.stdout.write(f'{status:4} {name}: {before} -> {after} запросов')
+            if before != after:
+                failures.append(name)
+
+        if failures:
+            raise CommandError(f'Число запросов растёт с числом строк: {", ".join(failures)}')
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections, router
+
+from config.db import PRIMARY, close_unusable_connections, read_from_replicas
+from movies.models import FilmWork
+
+
+class Command(BaseCommand):
+    help = ('Проверяет настройку реплик и постоянных соединений: роль и отставание каждой базы, '
+            'маршрутизацию чтений и записей, переиспользование соединения между запросами.')
+
+    def handle(self, *args, **options):
+        failures = []
+
+        for alias in settings.DATABASES:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT pg_is_in_recovery(), now() - pg_last_xact_replay_timestamp()')
+                in_recovery, lag = cursor.fetchone()
+            role = 'реплика' if in_recovery else 'основная'
+            self.stdout.write(f'{alias}: {role}, отставание {lag or "-"}')
+            if alias != PRIMARY and not in_recovery:
+                self.stderr.write(f'{alias} не в режиме реплики, проверяется только маршрутизация')
+
+        replicas = settings.DATABASE_REPLICAS
+        with read_from_replicas():
+            read = router.db_for_read(FilmWork)
+            self.check(failures, 'чтение в запросе', read, replicas or [PRIMARY])
+            self.check(failures, 'запись', router.db_for_write(FilmWork), [PRIMARY])
+            self.check(failures, 'чтение после записи', router.db_for_read(FilmWork), [PRIMARY])
+        self.check(failures, 'чтение вне запроса', router.db_for_read(FilmWork), [PRIMARY])
+
+        before = self.backend_pid()
+        request_finished.send(sender=self.__class__)
+        request_started.send(sender=self.__class__)
+        close_unusable_connections()
+        after = self.backend_pid()
+        reused = before == after
+        expected = settings.DATABASES[PRIMARY].get('CONN_MAX_AGE', 0) != 0
+        self.stdout.write(f'{"OK" if reused == expected else "FAIL":4} соединение между запросами: '
+                          f'{"переиспользуется" if reused else "открывается заново"}')
+        if reused != expected:
+            failures.append('постоянные соединения')
+
+        if failures:
+            raise CommandError(f'Не прошли проверки: {", ".join(failures)}')
+
+    def check(self, failures: list, name: str, alias: str, expected: list):
+        status = 'OK' if alias in expected else 'FAIL'
+        self.stdout.write(f'{status:4} {name}: {alias}')
+        if status == 'FAIL':
+            failures.append(name)
+
+    @staticmethod
+    def backend_pid() -> int:
+        with connections[PRIMARY].cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
@@ -0,0 +1,26 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.export import FilmExport
+
+
+class Command(BaseCommand):
+    help = 'Выгружает все фильмы с жанрами и персонами в CSV или NDJSON, память не зависит от числа строк.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FilmExport.formats), default='csv')
+        parser.add_argument('--output', '-o', default='-', help='файл выгрузки, - для stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='строк на одно чтение серверного курсора')
+
+    def handle(self, *args, **options):
+        export = FilmExport(options['format'], chunk_size=options['chunk_size'])
+        started = time.perf_counter()
+        if options['output'] == '-':
+            count = export.write(sys.stdout)
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+                count = export.write(file)
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f'Выгружено {count} фильмов за {elapsed:.1f} с')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.importer import FeedImporter, read_feed
+from movies.signals import invalidate_all
+
+
+class Command(BaseCommand):
+    help = ('Импорт фильмов, персон и связей из CSV или NDJSON (формат по расширению: .csv, .ndjson, .jsonl). '
+            'Жанры и персоны по именам находятся или создаются, запись идёт bulk_create порциями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--persons', help='персоны: id, full_name, birth_date')
+        parser.add_argument('--films', help=('фильмы: id, title, description, creation_date, rating, type, genres, '
+                                             'directors, writers, actors - формат export_films'))
+        parser.add_argument('--credits', help='связи: film_id, person_id или full_name, role')
+        parser.add_argument('--batch', type=int, default=5000, help='записей в одной транзакции')
+
+    def handle(self, *args, **options):
+        feeds = [(name, options[name]) for name in ('persons', 'films', 'credits') if options[name]]
+        if not feeds:
+            raise CommandError('Укажите хотя бы один файл: --persons, --films или --credits')
+
+        importer = FeedImporter(batch_size=options['batch'])
+        try:
+            for name, path in feeds:
+                getattr(importer, f'import_{name}')(read_feed(path))
+                self.stdout.write(f'{path}: {importer.counts}, {importer.rate():.0f} записей/с')
+        finally:
+            invalidate_all()
+
+        self.stdout.write(f'Готово за {importer.elapsed:.1f} с: {importer.counts}, {importer.rate():.0f} записей/с')
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from movies.cache import query_cache
+from movies.models import Genre, Person
+
+COUNTERS = {
+    'person': ('film_count', 'director_count', 'writer_count', 'actor_count'),
+    'genre': ('film_count',),
+}
+
+# count(*) OVER () - число всех расхождений за один проход, вместе с первыми строками
+MISMATCHES = """
+SELECT count(*) OVER (), target.id, {stored}, {actual}
+FROM content.{table} AS target
+JOIN content.{table}_counters_actual AS actual ON actual.id = target.id
+WHERE ({stored}) IS DISTINCT FROM ({actual})
+LIMIT %s
+"""
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики фильмов и ролей у персон и жанров по связующим таблицам '
+            '(content.rebuild_counters()). С --check только ищет расхождения и завершается с ошибкой, если они есть.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='только проверить, ничего не меняя')
+        parser.add_argument('--examples', type=int, default=5, help='сколько расхождений показать по каждой таблице')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['check']:
+            total = sum(self.mismatches(table, columns, options['examples']) for table, columns in COUNTERS.items())
+            self.stdout.write(f'Проверка заняла {time.perf_counter() - started:.1f} с')
+            if total:
+                raise CommandError(f'Счётчики расходятся в {total} строках, запустите rebuild_counters')
+            self.stdout.write('Расхождений нет')
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SELECT counter_table, fixed FROM content.rebuild_counters()')
+            fixed = cursor.fetchall()
+        query_cache.invalidate(Person)
+        query_cache.invalidate(Genre)
+        for table, count in fixed:
+            self.stdout.write(f'content.{table}: исправлено строк {count}')
+        self.stdout.write(f'Пересчёт занял {time.perf_counter() - started:.1f} с')
+
+    def mismatches(self, table: str, columns: tuple, examples: int) -> int:
+        sql = MISMATCHES.format(table=table, stored=', '.join(f'target.{column}' for column in columns),
+                                actual=', '.join(f'actual.{column}' for column in columns))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [max(1, examples)])
+            rows = cursor.fetchall()
+
+        count = rows[0][0] if rows else 0
+        self.stdout.write(f'content.{table}: расхождений {count}')
+        for row in rows[:examples]:
+            stored, actual = row[2:2 + len(columns)], row[2 + len(columns):]
+            self.stdout.write(f'  {row[1]}: ' + ', '.join(f'{column} {was} вместо {expected}'
+                                                        for column, was, expected in zip(columns, stored, actual)
+                                                        if was != expected))
+        return count
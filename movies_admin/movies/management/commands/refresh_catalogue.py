@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from movies.cache import query_cache
+from movies.models import FilmCatalogue
+
+
+class Command(BaseCommand):
+    help = ('Обновляет материализованное представление content.film_catalogue. По умолчанию CONCURRENTLY: '
+            'чтения не блокируются, но обновление дольше.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocking', action='store_true',
+                            help='обычный REFRESH: быстрее, но блокирует чтение представления')
+
+    def handle(self, *args, **options):
+        concurrently = '' if options['blocking'] else 'CONCURRENTLY '
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f'REFRESH MATERIALIZED VIEW {concurrently}content.film_catalogue')
+            cursor.execute('ANALYZE content.film_catalogue')
+        query_cache.invalidate(FilmCatalogue)
+        self.stdout.write(f'content.film_catalogue обновлено за {time.perf_counter() - started:.1f} с')
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+# Django 3.2 не умеет задавать opclass для индекса по выражению, поэтому индексы создаются SQL.
+# text_pattern_ops нужен, чтобы UPPER(...) LIKE 'ПРЕФИКС%' шёл по btree при любой collation.
+CREATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS person_full_name_prefix ON content.person (UPPER(full_name::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS genre_name_prefix ON content.genre (UPPER(name::text) text_pattern_ops);
+"""
+
+DROP_INDEXES = """
+DROP INDEX IF EXISTS content.person_full_name_prefix;
+DROP INDEX IF EXISTS content.genre_name_prefix;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEXES, DROP_INDEXES),
+    ]
@@ -0,0 +1,76 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+CREATE_VIEW = """
+CREATE MATERIALIZED VIEW content.film_catalogue AS
+SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating, fw.type, fw.created_at, fw.updated_at,
+       coalesce(genres.names, '{}') AS genres,
+       coalesce(persons.directors, '{}') AS directors,
+       coalesce(persons.writers, '{}') AS writers,
+       coalesce(persons.actors, '{}') AS actors
+FROM content.film_work fw
+LEFT JOIN (
+    SELECT gfw.filmwork_id, array_agg(g.name ORDER BY g.name)::text[] AS names
+    FROM content.genre_film_work gfw
+    JOIN content.genre g ON g.id = gfw.genre_id
+    GROUP BY gfw.filmwork_id
+) AS genres ON genres.filmwork_id = fw.id
+LEFT JOIN (
+    SELECT pfw.filmwork_id,
+           array_agg(p.full_name ORDER BY p.full_name) FILTER (WHERE pfw.role = 'director')::text[] AS directors,
+           array_agg(p.full_name ORDER BY p.full_name) FILTER (WHERE pfw.role = 'writer')::text[] AS writers,
+           array_agg(p.full_name ORDER BY p.full_name) FILTER (WHERE pfw.role = 'actor')::text[] AS actors
+    FROM content.person_film_work pfw
+    JOIN content.person p ON p.id = pfw.person_id
+    GROUP BY pfw.filmwork_id
+) AS persons ON persons.filmwork_id = fw.id
+WITH DATA;
+
+-- уникальный индекс обязателен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX film_catalogue_pk ON content.film_catalogue (id);
+CREATE INDEX film_catalogue_created_idx ON content.film_catalogue (created_at, id);
+CREATE INDEX film_catalogue_title_trgm ON content.film_catalogue USING gin (UPPER(title::text) gin_trgm_ops);
+CREATE INDEX film_catalogue_genres_idx ON content.film_catalogue USING gin (genres);
+CREATE INDEX film_catalogue_actors_idx ON content.film_catalogue USING gin (actors);
+"""
+
+DROP_VIEW = 'DROP MATERIALIZED VIEW IF EXISTS content.film_catalogue;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_VIEW, DROP_VIEW),
+        migrations.CreateModel(
+            name='FilmCatalogue',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255, verbose_name='title')),
+                ('description', models.TextField(verbose_name='description')),
+                ('creation_date', models.DateField(null=True, verbose_name='creation date')),
+                ('rating', models.FloatField(null=True, verbose_name='rating')),
+                ('type', models.CharField(choices=[('movie', 'movie'), ('tv_show', 'TV Show')], max_length=20,
+                                          verbose_name='type')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('genres', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None,
+                                                                     verbose_name='genres')),
+                ('directors', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None,
+                                                                        verbose_name='directors')),
+                ('writers', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None,
+                                                                      verbose_name='writers')),
+                ('actors', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None,
+                                                                     verbose_name='actors')),
+            ],
+            options={
+                'verbose_name': 'film catalogue entry',
+                'verbose_name_plural': 'film catalogue',
+                'db_table': 'content"."film_catalogue',
+                'managed': False,
+            },
+        ),
+    ]
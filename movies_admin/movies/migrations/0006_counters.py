@@ -0,0 +1,220 @@
+from django.db import migrations, models
+
+ROLES = ('director', 'writer', 'actor')
+
+# Счётчики меняются триггерами FOR EACH STATEMENT по разнице между удалёнными и добавленными
+# строками связи (transition tables), поэтому COPY и bulk_create обновляют каждую персону и жанр
+# один раз за запрос, без пересчёта по всей таблице связей.
+# Число фильмов меняется, только когда у пары (персона или жанр, фильм) появилась первая
+# или исчезла последняя связь; число связей пары до запроса = сейчас - добавлено + удалено.
+CHANGES = {
+    'INSERT': 'SELECT {columns}, 1 AS delta FROM new_rows',
+    'DELETE': 'SELECT {columns}, -1 AS delta FROM old_rows',
+    'UPDATE': 'SELECT {columns}, 1 AS delta FROM new_rows UNION ALL SELECT {columns}, -1 FROM old_rows',
+}
+
+# Строки персон и жанров сначала блокируются в порядке id: параллельные загрузки не попадают в deadlock,
+# а следующий запрос берёт новый снимок и видит связи, закоммиченные ими до получения блокировки
+APPLY_CHANGES = """
+        PERFORM 1 FROM content.{target}
+        WHERE id IN (SELECT {key} FROM ({changes}) AS changes)
+        ORDER BY id FOR UPDATE;
+
+        WITH changes AS ({changes}),
+        pairs AS (
+            SELECT {key}, filmwork_id, sum(delta) AS delta FROM changes GROUP BY {key}, filmwork_id
+        ),
+        films AS (
+            SELECT pairs.{key}, sum((links.count > 0)::int - (links.count - pairs.delta > 0)::int) AS delta
+            FROM pairs
+            CROSS JOIN LATERAL (
+                SELECT count(*) FROM content.{link} AS link
+                WHERE link.filmwork_id = pairs.filmwork_id AND link.{key} = pairs.{key}
+            ) AS links
+            GROUP BY pairs.{key}
+        ){credits}
+        UPDATE content.{target} AS target
+        SET film_count = target.film_count + films.delta{role_updates}
+        FROM films{credits_join}
+        WHERE target.id = films.{key} AND (films.delta <> 0{role_changed});
+"""
+
+CREDITS = """,
+        credits AS (
+            SELECT {key},
+                   {role_sums}
+            FROM changes GROUP BY {key}
+        )"""
+
+COUNTERS_FUNCTION = """
+CREATE OR REPLACE FUNCTION content.{link}_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{insert}
+    ELSIF TG_OP = 'DELETE' THEN{delete}
+    ELSE{update}
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.{link}_counters_reset() RETURNS trigger AS $$
+BEGIN
+    UPDATE content.{target} SET {reset} WHERE {nonzero};
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {link}_counters_insert
+    AFTER INSERT ON content.{link} REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE content.{link}_counters();
+CREATE TRIGGER {link}_counters_delete
+    AFTER DELETE ON content.{link} REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE content.{link}_counters();
+CREATE TRIGGER {link}_counters_update
+    AFTER UPDATE ON content.{link} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE content.{link}_counters();
+CREATE TRIGGER {link}_counters_truncate
+    AFTER TRUNCATE ON content.{link}
+    FOR EACH STATEMENT EXECUTE PROCEDURE content.{link}_counters_reset();
+"""
+
+DROP_COUNTERS_FUNCTION = """
+DROP TRIGGER IF EXISTS {link}_counters_insert ON content.{link};
+DROP TRIGGER IF EXISTS {link}_counters_delete ON content.{link};
+DROP TRIGGER IF EXISTS {link}_counters_update ON content.{link};
+DROP TRIGGER IF EXISTS {link}_counters_truncate ON content.{link};
+DROP FUNCTION IF EXISTS content.{link}_counters();
+DROP FUNCTION IF EXISTS content.{link}_counters_reset();
+"""
+
+
+def counters_sql(target: str, link: str, key: str, roles: tuple = ()) -> str:
+    columns = ', '.join((key, 'filmwork_id', *(['role'] if roles else [])))
+    role_sums = ',\n                   '.join(f"coalesce(sum(delta) FILTER (WHERE role = '{role}'), 0) AS {role}"
+                                              for role in roles)
+    credits = CREDITS.format(key=key, role_sums=role_sums) if roles else ''
+    credits_join = f' JOIN credits USING ({key})' if roles else ''
+    role_updates = ''.join(f',\n            {role}_count = target.{role}_count + credits.{role}' for role in roles)
+    role_changed = ''.join(f' OR credits.{role} <> 0' for role in roles)
+    counters = ('film_count', *(f'{role}_count' for role in roles))
+
+    def apply(operation: str) -> str:
+        changes = CHANGES[operation].format(columns=columns)
+        return APPLY_CHANGES.format(target=target, link=link, key=key, changes=changes, credits=credits,
+                                    credits_join=credits_join, role_updates=role_updates, role_changed=role_changed)
+
+    return COUNTERS_FUNCTION.format(
+        target=target, link=link, insert=apply('INSERT'), delete=apply('DELETE'), update=apply('UPDATE'),
+        reset=', '.join(f'{counter} = 0' for counter in counters),
+        nonzero=' OR '.join(f'{counter} <> 0' for counter in counters),
+    )
+
+
+# фактические значения счётчиков: по ним rebuild_counters пересчитывает таблицы, а команда
+# rebuild_counters --check ищет расхождения
+CREATE_ACTUAL = f"""
+ALTER TABLE content.person
+    ALTER COLUMN film_count SET DEFAULT 0,
+    {', '.join(f'ALTER COLUMN {role}_count SET DEFAULT 0' for role in ROLES)};
+ALTER TABLE content.genre ALTER COLUMN film_count SET DEFAULT 0;
+
+CREATE OR REPLACE VIEW content.person_counters_actual AS
+SELECT p.id,
+       count(DISTINCT pfw.filmwork_id) AS film_count,
+       {', '.join(f"count(pfw.id) FILTER (WHERE pfw.role = '{role}') AS {role}_count" for role in ROLES)}
+FROM content.person AS p
+LEFT JOIN content.person_film_work AS pfw ON pfw.person_id = p.id
+GROUP BY p.id;
+
+CREATE OR REPLACE VIEW content.genre_counters_actual AS
+SELECT g.id, count(DISTINCT gfw.filmwork_id) AS film_count
+FROM content.genre AS g
+LEFT JOIN content.genre_film_work AS gfw ON gfw.genre_id = g.id
+GROUP BY g.id;
+
+CREATE OR REPLACE FUNCTION content.rebuild_counters() RETURNS TABLE (counter_table text, fixed bigint) AS $$
+DECLARE
+    updated bigint;
+BEGIN
+    -- SHARE не мешает чтению, но не даёт менять связи, пока идёт пересчёт
+    LOCK TABLE content.person_film_work, content.genre_film_work IN SHARE MODE;
+
+    UPDATE content.person AS target
+    SET film_count = actual.film_count,
+        {', '.join(f'{role}_count = actual.{role}_count' for role in ROLES)}
+    FROM content.person_counters_actual AS actual
+    WHERE target.id = actual.id
+      AND (target.film_count, {', '.join(f'target.{role}_count' for role in ROLES)})
+          IS DISTINCT FROM (actual.film_count, {', '.join(f'actual.{role}_count' for role in ROLES)});
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    counter_table := 'person';
+    fixed := updated;
+    RETURN NEXT;
+
+    UPDATE content.genre AS target
+    SET film_count = actual.film_count
+    FROM content.genre_counters_actual AS actual
+    WHERE target.id = actual.id AND target.film_count IS DISTINCT FROM actual.film_count;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    counter_table := 'genre';
+    fixed := updated;
+    RETURN NEXT;
+END
+$$ LANGUAGE plpgsql;
+
+SELECT content.rebuild_counters();
+"""
+
+DROP_ACTUAL = """
+DROP FUNCTION IF EXISTS content.rebuild_counters();
+DROP VIEW IF EXISTS content.person_counters_actual;
+DROP VIEW IF EXISTS content.genre_counters_actual;
+"""
+
+
+def counter(verbose_name: str):
+    return models.IntegerField(verbose_name, default=0, editable=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_film_catalogue'),
+    ]
+
+    operations = [
+        migrations.AddField(model_name='person', name='film_count', field=counter('films')),
+        migrations.AddField(model_name='person', name='director_count', field=counter('director credits')),
+        migrations.AddField(model_name='person', name='writer_count', field=counter('writer credits')),
+        migrations.AddField(model_name='person', name='actor_count', field=counter('actor credits')),
+        migrations.AddField(model_name='genre', name='film_count', field=counter('films')),
+        migrations.RunSQL(CREATE_ACTUAL, DROP_ACTUAL),
+        migrations.RunSQL(
+            counters_sql('person', 'person_film_work', 'person_id', ROLES),
+            DROP_COUNTERS_FUNCTION.format(link='person_film_work'),
+        ),
+        migrations.RunSQL(
+            counters_sql('genre', 'genre_film_work', 'genre_id'),
+            DROP_COUNTERS_FUNCTION.format(link='genre_film_work'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['film_count', 'id'], name='person_film_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['director_count', 'id'], name='person_director_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['writer_count', 'id'], name='person_writer_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['actor_count', 'id'], name='person_actor_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genre',
+            index=models.Index(fields=['film_count', 'id'], name='genre_film_count_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# text_pattern_ops из 0004 годится для LIKE 'ПРЕФИКС%', но не для ORDER BY UPPER(...) в collation базы:
+# автодополнение сортировало все совпадения перед LIMIT. Индекс в collation "C" и с id вторым столбцом
+# обслуживает и префикс, и сортировку из movies.search.prefix_search (Collate(Upper(...), 'C'), id).
+CREATE_INDEXES = """
+DROP INDEX IF EXISTS content.person_full_name_prefix;
+DROP INDEX IF EXISTS content.genre_name_prefix;
+CREATE INDEX IF NOT EXISTS person_full_name_prefix ON content.person ((UPPER(full_name::text) COLLATE "C"), id);
+CREATE INDEX IF NOT EXISTS genre_name_prefix ON content.genre ((UPPER(name::text) COLLATE "C"), id);
+"""
+
+DROP_INDEXES = """
+DROP INDEX IF EXISTS content.person_full_name_prefix;
+DROP INDEX IF EXISTS content.genre_name_prefix;
+CREATE INDEX IF NOT EXISTS person_full_name_prefix ON content.person (UPPER(full_name::text) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS genre_name_prefix ON content.genre (UPPER(name::text) text_pattern_ops);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEXES, DROP_INDEXES),
+    ]
@@ -1,5 +1,8 @@
 import uuid
 
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -18,6 +21,8 @@ class Genre(TimeStampedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4)
     name = models.CharField(_('title'), max_length=255)
     description = models.TextField(_('description'), blank=True)
+    # счётчики ведут триггеры на связующих таблицах, см. миграцию 0006_counters
+    film_count = models.IntegerField(_('films'), default=0, editable=False)
 
     def __str__(self):
         return f'{self.name}'
@@ -26,6 +31,11 @@ class Genre(TimeStampedModel):
         verbose_name = _('genre')
         verbose_name_plural = _('genres')
         db_table = "content\".\"genre"
+        # индекс по UPPER(name) для автодополнения создаётся в миграции 0004_autocomplete_indexes
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='genre_created_idx'),
+            models.Index(fields=['film_count', 'id'], name='genre_film_count_idx'),
+        ]
 
 
 class FilmWorkGenre(models.Model):
@@ -70,6 +80,9 @@ class FilmWork(TimeStampedModel):
 
     genres = models.ManyToManyField(Genre, through='FilmworkGenre')
 
+    # заполняется триггером в БД из title и description, см. миграцию 0002_search
+    search_vector = SearchVectorField(null=True, editable=False)
+
     def __str__(self):
         return f'{self.title}'
 
@@ -77,12 +90,22 @@ class FilmWork(TimeStampedModel):
         verbose_name = _('filmwork')
         verbose_name_plural = _('filmworks')
         db_table = "content\".\"film_work"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='film_work_created_idx'),
+            GinIndex(fields=['search_vector'], name='film_work_search_idx'),
+            GinIndex(fields=['title'], name='film_work_title_trgm', opclasses=['gin_trgm_ops']),
+        ]
 
 
 class Person(TimeStampedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4)
     full_name = models.CharField(_('full_name'), max_length=255)
     birth_date = models.DateField(_('birth date'), blank=True)
+    # счётчики ведут триггеры на связующих таблицах, см. миграцию 0006_counters
+    film_count = models.IntegerField(_('films'), default=0, editable=False)
+    director_count = models.IntegerField(_('director credits'), default=0, editable=False)
+    writer_count = models.IntegerField(_('writer credits'), default=0, editable=False)
+    actor_count = models.IntegerField(_('actor credits'), default=0, editable=False)
 
     def __str__(self):
         return f'{self.full_name}'
@@ -91,6 +114,15 @@ class Person(TimeStampedModel):
         verbose_name = _('person')
         verbose_name_plural = _('persons')
         db_table = 'content\".\"person'
+        # индекс по UPPER(full_name) для автодополнения создаётся в миграции 0004_autocomplete_indexes
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='person_created_idx'),
+            GinIndex(fields=['full_name'], name='person_full_name_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['film_count', 'id'], name='person_film_count_idx'),
+            models.Index(fields=['director_count', 'id'], name='person_director_count_idx'),
+            models.Index(fields=['writer_count', 'id'], name='person_writer_count_idx'),
+            models.Index(fields=['actor_count', 'id'], name='person_actor_count_idx'),
+        ]
 
 
 class FilmWorkPerson(models.Model):
@@ -115,3 +147,32 @@ class FilmWorkPerson(models.Model):
         indexes = [
             models.Index(fields=['filmwork', 'person', 'role']),
         ]
+
+
+class FilmCatalogue(models.Model):
+    """ Фильм с жанрами и персонами по ролям одной строкой.
+
+    Материализованное представление content.film_catalogue из миграции 0005_film_catalogue, только для чтения.
+    Обновляется командой refresh_catalogue, поэтому может отставать от film_work до следующего обновления.
+    """
+    id = models.UUIDField(primary_key=True)
+    title = models.CharField(_('title'), max_length=255)
+    description = models.TextField(_('description'))
+    creation_date = models.DateField(_('creation date'), null=True)
+    rating = models.FloatField(_('rating'), null=True)
+    type = models.CharField(_('type'), max_length=20, choices=FilmWork.FilmWorkType.choices)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    genres = ArrayField(models.TextField(), verbose_name=_('genres'))
+    directors = ArrayField(models.TextField(), verbose_name=_('directors'))
+    writers = ArrayField(models.TextField(), verbose_name=_('writers'))
+    actors = ArrayField(models.TextField(), verbose_name=_('actors'))
+
+    def __str__(self):
+        return f'{self.title}'
+
+    class Meta:
+        managed = False
+        verbose_name = _('film catalogue entry')
+        verbose_name_plural = _('film catalogue')
+        db_table = 'content\".\"film_catalogue'
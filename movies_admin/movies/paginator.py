@@ -0,0 +1,102 @@
+import hashlib
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+from movies.cache import query_cache, query_models
+
+
+class EstimatedCountPaginator(Paginator):
+    """ Пагинатор для больших таблиц.
+
+    Без фильтров число строк берётся из оценки планировщика (pg_class.reltuples), с фильтрами -
+    считается не дальше count_cap строк. Глубокие страницы при сортировке по keyset_ordering
+    выбираются поиском по ключу (created_at, id) вместо OFFSET: ключ последней строки страницы
+    запоминается в кеше, и следующая страница начинается сразу после него.
+    Быстро так идёт только листание подряд. При переходе на дальнюю страницу без ключа в кеше
+    ключ ищется OFFSET-ом по одному индексу: это дешевле полного OFFSET, но время растёт с номером страницы.
+    created_at допускает NULL; при сортировке по убыванию такие строки идут первыми, и если ключ
+    предыдущей страницы попал на них, страница выбирается обычным OFFSET.
+    Точные числа строк и ключи страниц хранятся в query_cache до изменения таблиц запроса.
+    """
+    exact_count_below = 10000
+    count_cap = 10000
+    keyset_ordering = ('-created_at', '-id')
+    keyset_offset = 1000
+    boundary_timeout = 300
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return self.cached('count', lambda: queryset.order_by()[:self.count_cap].count())
+
+        estimate = self.estimated_count()
+        if estimate < self.exact_count_below:
+            return self.cached('count', queryset.count)
+        return estimate
+
+    def query_key(self) -> str:
+        query = f'{self.object_list.query}:{self.per_page}'
+        return hashlib.md5(query.encode()).hexdigest()
+
+    def cached(self, kind: str, compute):
+        return query_cache.get(f'{kind}:{self.query_key()}', compute, query_models(self.object_list))
+
+    def estimated_count(self) -> int:
+        queryset = self.object_list
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                [connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # -1 или 0 - таблица ещё не анализировалась
+        return row[0] if row and row[0] and row[0] > 0 else 0
+
+    def uses_keyset(self) -> bool:
+        ordering = tuple('-id' if field == '-pk' else field for field in self.object_list.query.order_by)
+        return ordering == self.keyset_ordering
+
+    def page(self, number):
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        if offset < self.keyset_offset or not self.uses_keyset():
+            return super().page(number)
+
+        boundary = self.boundary(number - 1, offset)
+        # (NULL, id) < (...) не выполняется ни для одной строки
+        if boundary is None or boundary[0] is None:
+            return super().page(number)
+
+        rows = list(self.after(boundary)[:self.per_page])
+        if rows:
+            query_cache.set(self.boundary_key(number), (rows[-1].created_at, rows[-1].pk),
+                            query_models(self.object_list), self.boundary_timeout)
+        return self._get_page(rows, number, self)
+
+    def boundary_key(self, number: int) -> str:
+        return f'keyset:{self.query_key()}:{number}'
+
+    def boundary(self, number: int, offset: int):
+        """ Ключ последней строки страницы number: из кеша или OFFSET-ом по индексу (created_at, id) """
+        models = query_models(self.object_list)
+        boundary = query_cache.lookup(self.boundary_key(number), models)
+        if boundary is None:
+            keys = self.object_list.prefetch_related(None).values_list('created_at', 'pk')
+            rows = list(keys[offset - 1:offset])
+            if not rows:
+                return None
+            boundary = tuple(rows[0])
+            query_cache.set(self.boundary_key(number), boundary, models, self.boundary_timeout)
+        return boundary
+
+    def after(self, boundary):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        condition = RawSQL(f'({table}."created_at", {table}."id") < (%s, %s)', boundary, output_field=BooleanField())
+        return queryset.filter(condition)
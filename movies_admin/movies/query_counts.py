@@ -0,0 +1,70 @@
+""" Число SQL-запросов страниц админки: общее для тестов и команды check_admin_queries """
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from movies.models import FilmWork, Genre, Person
+from movies.seed import seed_films, seed_genres, seed_persons
+from movies.signals import invalidate_all
+
+CHANGELISTS = {
+    'filmwork changelist': FilmWork,
+    'person changelist': Person,
+    'genre changelist': Genre,
+}
+
+
+class AdminQueryCounter:
+    """ Рендерит страницы админки от имени суперпользователя, которого нет в базе """
+
+    def __init__(self):
+        self.factory = RequestFactory()
+        self.user = get_user_model()(username='query-check', is_active=True, is_staff=True, is_superuser=True)
+
+    def request(self, path: str = '/'):
+        request = self.factory.get(path)
+        request.user = self.user
+        return request
+
+    def count(self, render) -> int:
+        # bulk_create не шлёт сигналов, а замеры должны идти с холодным кешем; кеш ContentType живёт
+        # в процессе, и без сброса его запрос достаётся только первому замеру
+        invalidate_all()
+        ContentType.objects.clear_cache()
+        with CaptureQueriesContext(connection) as context:
+            response = render()
+            if hasattr(response, 'render'):
+                response.render()
+        return len(context.captured_queries)
+
+    def changelist(self, model) -> int:
+        model_admin = admin.site._registry[model]
+        return self.count(lambda: model_admin.changelist_view(self.request()))
+
+    def change_form(self, model, object_id) -> int:
+        model_admin = admin.site._registry[model]
+        return self.count(lambda: model_admin.change_view(self.request(), str(object_id)))
+
+
+def compare_query_counts(small: int = 5, large: int = 40) -> dict:
+    """ {страница: (запросов на малых данных, запросов на больших)}.
+
+    Создаёт строки в текущей базе; откатывать их должен вызывающий (транзакция или TestCase).
+    """
+    counter = AdminQueryCounter()
+    genres = seed_genres(large)
+    persons = seed_persons(large * 2)
+    small_film = seed_films(1, genres, persons, credits_per_film=small, genres_per_film=small)[0]
+    large_film = seed_films(1, genres, persons, credits_per_film=large, genres_per_film=large)[0]
+    seed_films(small, genres, persons)
+
+    before = {name: counter.changelist(model) for name, model in CHANGELISTS.items()}
+    seed_films(large, genres, persons)
+    after = {name: counter.changelist(model) for name, model in CHANGELISTS.items()}
+
+    before['filmwork change form'] = counter.change_form(FilmWork, small_film.pk)
+    after['filmwork change form'] = counter.change_form(FilmWork, large_film.pk)
+    return {name: (before[name], after[name]) for name in before}
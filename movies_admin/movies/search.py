@@ -0,0 +1,133 @@
+import re
+import uuid
+from datetime import date
+
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db.models import CharField, F, Q, TextField, Value
+from django.db.models.functions import Collate, Upper
+from django.db.models.lookups import IContains
+
+# Должна совпадать с конфигурацией в триггере миграции 0002_search
+SEARCH_CONFIG = 'english'
+
+_WORD = re.compile(r'\w+')
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class ILikeContains(IContains):
+    """ icontains без UPPER(): `поле ILIKE '%term%'` идёт по GIN-индексу gin_trgm_ops на самом поле.
+
+    Стандартный icontains в Postgres сравнивает UPPER(поле::text), и индекс на поле ему не подходит.
+    """
+    lookup_name = 'ilike_contains'
+
+    def get_rhs_op(self, connection, rhs):
+        return f'ILIKE {rhs}'
+
+
+def parse_uuid(term: str):
+    try:
+        return uuid.UUID(term.strip())
+    except ValueError:
+        return None
+
+
+def parse_date(term: str):
+    try:
+        return date.fromisoformat(term.strip())
+    except ValueError:
+        return None
+
+
+def prefix_query(term: str):
+    """ tsquery по префиксам всех слов: `star wa` -> `star:* & wa:*` """
+    words = _WORD.findall(term.lower())
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), config=SEARCH_CONFIG, search_type='raw')
+
+
+def film_search(queryset, term: str):
+    """ Полнотекстовый поиск по title/description плюс нечёткое совпадение title по триграммам """
+    query = prefix_query(term)
+    condition = Q(title__trigram_similar=term)
+    rank = TrigramSimilarity('title', term)
+    if query is not None:
+        condition |= Q(search_vector=query)
+        rank = rank + SearchRank(F('search_vector'), query)
+    return queryset.filter(condition).annotate(search_rank=rank)
+
+
+def person_search(queryset, term: str):
+    """ Подстрока или нечёткое совпадение full_name, оба условия идут по GIN-индексу person_full_name_trgm """
+    condition = Q(full_name__ilike_contains=term) | Q(full_name__trigram_similar=term)
+    return queryset.filter(condition).annotate(search_rank=TrigramSimilarity('full_name', term))
+
+
+def prefix_search(queryset, field: str, term: str):
+    """ Префикс поля без учёта регистра, по порядку (UPPER(поле) COLLATE "C", id).
+
+    Условие и сортировка совпадают с индексом из миграции 0007, поэтому LIMIT дочитывает
+    только первые строки индекса, без сортировки всех совпадений.
+    """
+    return (queryset.alias(prefix_key=Collate(Upper(field), 'C'))
+            .filter(prefix_key__startswith=Upper(Value(term)))
+            .order_by('prefix_key', 'id'))
+
+
+def person_prefix_search(queryset, term: str):
+    """ Автодополнение: префикс full_name по индексу person_full_name_prefix """
+    return prefix_search(queryset, 'full_name', term)
+
+
+def genre_prefix_search(queryset, term: str):
+    """ Автодополнение: префикс name по индексу genre_name_prefix """
+    return prefix_search(queryset, 'name', term)
+
+
+class SearchChangeList(ChangeList):
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        if ORDER_VAR not in self.params and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank'] + ordering
+        return ordering
+
+
+class SearchAdminMixin:
+    """ Поиск в админке через индексы вместо ILIKE по всем search_fields.
+
+    Точный uuid ищется по первичному ключу, дата вида 1977-05-25 - по полям date_search_fields.
+    Иначе вызывается search_function (staticmethod), а результаты сортируются по релевантности,
+    если пользователь не выбрал сортировку сам.
+    Без search_function используется стандартный поиск Django.
+    autocomplete_function используется только для autocomplete-полей, см. movies.autocomplete.
+    """
+    search_function = None
+    autocomplete_function = None
+    date_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return super().get_search_results(request, queryset, search_term)
+
+        pk = parse_uuid(term)
+        if pk is not None:
+            return queryset.filter(pk=pk), False
+
+        day = parse_date(term) if self.date_search_fields else None
+        if day is not None:
+            condition = Q()
+            for field in self.date_search_fields:
+                condition |= Q(**{field: day})
+            return queryset.filter(condition), False
+
+        if self.search_function is None:
+            return super().get_search_results(request, queryset, search_term)
+        return self.search_function(queryset, term), False
+
+    def get_changelist(self, request, **kwargs):
+        return SearchChangeList
@@ -0,0 +1,58 @@
+import random
+from datetime import date
+
+from movies.models import (FilmWork, FilmWorkGenre, FilmWorkPerson, Genre,
+                           Person)
+
+WORDS = ('star', 'war', 'night', 'return', 'empire', 'lost', 'city', 'dark', 'light', 'hope', 'last', 'new',
+         'world', 'space', 'dream', 'king', 'river', 'storm', 'shadow', 'legend')
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def seed_genres(count: int, rng: random.Random = None, batch_size: int = 5000) -> list:
+    rng = rng or random.Random(0)
+    genres = [Genre(name=f'{_text(rng, 1, 2).title()} {index}', description=_text(rng, 0, 10))
+              for index in range(count)]
+    return Genre.objects.bulk_create(genres, batch_size=batch_size)
+
+
+def seed_persons(count: int, rng: random.Random = None, batch_size: int = 5000) -> list:
+    rng = rng or random.Random(0)
+    persons = [Person(full_name=f'{_text(rng, 2, 2).title()} {index}', birth_date=date(1950 + index % 50, 1, 1))
+               for index in range(count)]
+    return Person.objects.bulk_create(persons, batch_size=batch_size)
+
+
+def seed_films(count: int, genres: list, persons: list, credits_per_film: int = 6, genres_per_film: int = 2,
+               rng: random.Random = None, batch_size: int = 5000) -> list:
+    """ Фильмы со связями; персоны и жанры выбираются случайно из переданных списков """
+    rng = rng or random.Random(0)
+    films = FilmWork.objects.bulk_create([
+        FilmWork(title=_text(rng, 1, 4).title(), description=_text(rng, 0, 60), creation_date=date(2000, 1, 1),
+                 certificate='', file_path='', rating=round(rng.uniform(0, 10), 1),
+                 type=rng.choice(FilmWork.FilmWorkType.values))
+        for _ in range(count)
+    ], batch_size=batch_size)
+
+    links = []
+    credits = []
+    for film in films:
+        for genre in rng.sample(genres, min(genres_per_film, len(genres))):
+            links.append(FilmWorkGenre(filmwork=film, genre=genre))
+        for person in rng.sample(persons, min(credits_per_film, len(persons))):
+            credits.append(FilmWorkPerson(filmwork=film, person=person, role=rng.choice(FilmWorkPerson.Role.values)))
+    FilmWorkGenre.objects.bulk_create(links, batch_size=batch_size)
+    FilmWorkPerson.objects.bulk_create(credits, batch_size=batch_size)
+    return films
+
+
+def seed_catalogue(films: int, persons: int, genres: int, credits_per_film: int = 6, genres_per_film: int = 2,
+                   seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    genre_objects = seed_genres(genres, rng)
+    person_objects = seed_persons(persons, rng)
+    film_objects = seed_films(films, genre_objects, person_objects, credits_per_film, genres_per_film, rng)
+    return {'films': film_objects, 'persons': person_objects, 'genres': genre_objects}
@@ -0,0 +1,35 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from movies.cache import query_cache
+from movies.models import (FilmWork, FilmWorkGenre, FilmWorkPerson, Genre,
+                           Person)
+
+# bulk_create, update() и загрузка из sqlite_to_postgres сигналов не шлют:
+# такие изменения попадут в кеш не позже чем через QueryCache.timeout
+CACHED_MODELS = (FilmWork, Genre, Person, FilmWorkGenre, FilmWorkPerson)
+
+
+def invalidate(sender, **kwargs):
+    # после коммита, иначе параллельный запрос может успеть закешировать старые данные
+    transaction.on_commit(partial(query_cache.invalidate, sender), using=kwargs.get('using'))
+
+
+def invalidate_links(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate(sender, **kwargs)
+
+
+def invalidate_all():
+    """ Для изменений в обход сигналов: bulk_create, update(), прямой SQL """
+    for model in CACHED_MODELS:
+        query_cache.invalidate(model)
+
+
+def connect():
+    for model in CACHED_MODELS:
+        post_save.connect(invalidate, sender=model, dispatch_uid=f'query_cache_save_{model._meta.label_lower}')
+        post_delete.connect(invalidate, sender=model, dispatch_uid=f'query_cache_delete_{model._meta.label_lower}')
+    m2m_changed.connect(invalidate_links, sender=FilmWork.genres.through, dispatch_uid='query_cache_film_genres')
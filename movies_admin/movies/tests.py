@@ -0,0 +1,99 @@
+import uuid
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import TestCase
+
+from movies.importer import FeedImporter
+from movies.models import FilmWork, Person
+from movies.paginator import EstimatedCountPaginator
+from movies.query_counts import AdminQueryCounter, compare_query_counts
+from movies.seed import seed_films, seed_genres, seed_persons
+
+
+class AdminQueryCountTest(TestCase):
+    """ Число SQL-запросов списков и формы фильма не должно расти вместе с числом строк и связей """
+
+    def test_query_count_does_not_grow(self):
+        for name, (before, after) in compare_query_counts(small=5, large=40).items():
+            with self.subTest(page=name):
+                self.assertGreater(before, 0)
+                self.assertEqual(before, after)
+
+
+class AdminOrderingTest(TestCase):
+    """ Порядок mixin-ов в админках не должен отключать сортировку по релевантности и по индексам счётчиков """
+
+    def ordering(self, model, path: str) -> tuple:
+        request = AdminQueryCounter().request(path)
+        return admin.site._registry[model].get_changelist_instance(request).queryset.query.order_by
+
+    def test_search_sorts_by_rank(self):
+        for model in (FilmWork, Person):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.ordering(model, '/?q=star'), ('-search_rank', '-created_at', '-id'))
+
+    def test_counter_sort_matches_index(self):
+        column = admin.site._registry[Person].list_display.index('film_count') + 1
+        self.assertEqual(self.ordering(Person, f'/?o={column}'), ('film_count', 'pk'))
+        self.assertEqual(self.ordering(Person, f'/?o=-{column}'), ('-film_count', '-pk'))
+
+
+class AdminSearchTest(TestCase):
+    def test_person_search_by_birth_date(self):
+        persons = seed_persons(3)
+        request = AdminQueryCounter().request()
+        model_admin = admin.site._registry[Person]
+        found, _ = model_admin.get_search_results(request, Person.objects.all(), persons[1].birth_date.isoformat())
+        self.assertEqual(list(found), [persons[1]])
+
+
+def allow_nulls(table: str, *columns: str):
+    """ Как в db_schema.sql, где эти столбцы допускают NULL; ALTER откатится вместе с транзакцией теста """
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE content.{table} '
+                       + ', '.join(f'ALTER COLUMN {column} DROP NOT NULL' for column in columns))
+
+
+class KeysetPaginator(EstimatedCountPaginator):
+    keyset_offset = 1
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        films = seed_films(50, seed_genres(2), seed_persons(2))
+        # строки с NULL в created_at при сортировке по убыванию идут первыми
+        allow_nulls('film_work', 'created_at')
+        FilmWork.objects.filter(pk__in=[film.pk for film in films[:12]]).update(created_at=None)
+
+    def test_pages_match_offset(self):
+        queryset = FilmWork.objects.order_by('-created_at', '-id')
+        expected = Paginator(queryset, 5)
+        paginator = KeysetPaginator(queryset, 5)
+        for number in expected.page_range:
+            with self.subTest(page=number):
+                self.assertEqual([film.pk for film in paginator.page(number)],
+                                 [film.pk for film in expected.page(number)])
+
+
+class FeedImporterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        allow_nulls('film_work', 'creation_date', 'rating')
+        allow_nulls('person', 'birth_date')
+
+    def test_counts_only_inserted_rows(self):
+        film = {'id': str(uuid.uuid4()), 'title': 'Star Wars', 'genres': ['Sci-Fi'], 'actors': ['Mark Hamill']}
+        person = {'id': str(uuid.uuid4()), 'full_name': 'George Lucas'}
+
+        importer = FeedImporter()
+        importer.import_persons([person, person])
+        importer.import_films([film, film])
+        self.assertEqual(importer.counts, {'films': 1, 'persons': 2, 'genres': 1, 'film_genres': 1, 'credits': 1})
+
+        importer = FeedImporter()
+        importer.import_persons([person])
+        importer.import_films([film])
+        self.assertEqual(importer.counts, {'films': 0, 'persons': 0, 'genres': 0, 'film_genres': 0, 'credits': 0})
@@ -0,0 +1,22 @@
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class PrefilledAutocompleteSelect(AutocompleteSelect):
+    """ AutocompleteSelect, который не запрашивает подпись выбранного значения, если она уже известна.
+
+    labels - словарь {pk: подпись}, его заполняет formset из связанных объектов, загруженных через select_related.
+    """
+    labels = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = [str(v) for v in value if str(v) not in self.choices.field.empty_values]
+        labels = self.labels or {}
+        if not selected or any(v not in labels for v in selected):
+            return super().optgroups(name, value, attr)
+
+        default = (None, [], 0)
+        if not self.is_required and not self.allow_multiple_selected:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        for option_value in selected:
+            default[1].append(self.create_option(name, option_value, labels[option_value], True, len(default[1])))
+        return [default]
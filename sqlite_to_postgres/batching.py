@@ -0,0 +1,81 @@
+class FixedBatch:
+    """Постоянный размер пачки"""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+
+    def update(self, rows: int, seconds: float, size_bytes: int):
+        pass
+
+    def __str__(self):
+        return f"fixed({self.size})"
+
+
+class AdaptiveBatch:
+    """Размер пачки, подстраиваемый под целевое время коммита и потолок памяти на пачку.
+
+    После каждой записанной пачки по измеренным времени и объёму вычисляется размер,
+    при котором пачка укладывается в target_seconds и max_bytes. Размер сглаживается
+    и за один шаг меняется не больше чем в два раза.
+    """
+
+    def __init__(self, initial: int = 1000, minimum: int = 50, maximum: int = 100000,
+                 target_seconds: float = 0.5, max_bytes: int = 16 * 1024 * 1024, smoothing: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.smoothing = smoothing
+        self.size = self.__clamp(initial)
+        self.rows_per_second = 0.0
+        self.bytes_per_row = 0.0
+
+    def __clamp(self, size: float) -> int:
+        return int(min(self.maximum, max(self.minimum, size)))
+
+    def update(self, rows: int, seconds: float, size_bytes: int):
+        if rows <= 0:
+            return
+
+        self.bytes_per_row = size_bytes / rows
+        if seconds > 0:
+            self.rows_per_second = rows / seconds
+            by_latency = self.target_seconds * self.rows_per_second
+        else:
+            by_latency = self.size * 2
+        by_memory = self.max_bytes / self.bytes_per_row if self.bytes_per_row else self.maximum
+
+        ideal = min(by_latency, by_memory, self.size * 2)
+        ideal = max(ideal, self.size / 2)
+        self.size = self.__clamp(self.size + (ideal - self.size) * self.smoothing)
+
+    def __str__(self):
+        return (f"adaptive({self.size}, {self.rows_per_second:.0f} строк/с, "
+                f"{self.bytes_per_row:.0f} байт/строку)")
+
+
+def estimate_bytes(rows: list, values=None, sample: int = 50) -> int:
+    """Оценка объёма пачки по первым sample строкам; values - функция получения кортежа из строки"""
+    if not rows:
+        return 0
+    head = rows[:sample]
+    if values is not None:
+        head = [values(row) for row in head]
+    size = sum(len(value) if isinstance(value, (str, bytes)) else 8 for row in head for value in row)
+    return size * len(rows) // len(head)
+
+
+def batch_policy(spec, target_seconds: float = 0.5, max_bytes: int = 16 * 1024 * 1024):
+    """Политика по описанию: число - постоянный размер, `adaptive` или `adaptive:<начальный размер>`"""
+    if isinstance(spec, (FixedBatch, AdaptiveBatch)):
+        return spec
+    if isinstance(spec, int):
+        return FixedBatch(spec)
+
+    spec = str(spec)
+    if spec.isdigit():
+        return FixedBatch(int(spec))
+    if spec == 'adaptive' or spec.startswith('adaptive:'):
+        _, _, initial = spec.partition(':')
+        return AdaptiveBatch(int(initial or 1000), target_seconds=target_seconds, max_bytes=max_bytes)
+    raise ValueError(f"Неизвестная политика размера пачки: {spec}")
@@ -0,0 +1,190 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+
+import psycopg2
+
+from config import env
+from load_data import load_table, table_dependencies, tables_models
+from scheduler import run_graph
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'schema_design', 'db_schema.sql')
+
+
+def default_dsl() -> dict:
+    return {
+        'dbname': env('DB_NAME'),
+        'user': env('DB_USER'),
+        'password': env('DB_PASSWORD'),
+        'host': env('DB_HOST'),
+        'port': env('DB_PORT')
+    }
+
+
+def reset_target(dsl: dict, schema_path: str):
+    """Создаёт схему content при необходимости и очищает таблицы перед прогоном"""
+    with closing(psycopg2.connect(**dsl)) as pg_conn:
+        cursor = pg_conn.cursor()
+        with open(schema_path, encoding='utf-8') as file:
+            cursor.execute(file.read())
+        cursor.execute('TRUNCATE content.film_work, content.genre, content.person CASCADE;')
+        pg_conn.commit()
+
+
+def source_counts(sqlite_path: str) -> dict:
+    with closing(sqlite3.connect(sqlite_path)) as connection:
+        return {table: connection.execute(f'SELECT Count() FROM {table}').fetchone()[0] for table in tables_models}
+
+
+def run_one(sqlite_path: str, dsl: dict, writer: str, copy_format: str, batch: str, workers: int) -> dict:
+    """Один прогон миграции с замером времени каждой таблицы; вызывается в отдельном процессе"""
+    counts = source_counts(sqlite_path)
+    timings = {}
+
+    def timed(table):
+        def task():
+            started = time.perf_counter()
+            load_table(sqlite_path, dsl, table, batch, writer={'mode': writer, 'copy_format': copy_format})
+            timings[table] = time.perf_counter() - started
+        return task
+
+    started = time.perf_counter()
+    run_graph({table: timed(table) for table in tables_models}, table_dependencies, workers)
+    wall = time.perf_counter() - started
+
+    return {
+        'writer': writer,
+        'copy_format': copy_format,
+        'batch': batch,
+        'workers': workers,
+        'wall_seconds': round(wall, 3),
+        'rows_per_second': round(sum(counts.values()) / wall, 1) if wall else None,
+        # ru_maxrss в Linux - килобайты
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'tables': {
+            table: {
+                'rows': counts[table],
+                'seconds': round(timings[table], 3),
+                'rows_per_second': round(counts[table] / timings[table], 1) if timings[table] else None,
+            }
+            for table in tables_models
+        },
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace):
+    dsl = {'dsn': args.dsn} if args.dsn else default_dsl()
+    results = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'dataset': {'path': args.sqlite, 'rows': source_counts(args.sqlite)},
+        'runs': [],
+    }
+
+    for writer, batch in itertools.product(args.writer, args.batch):
+        for attempt in range(args.repeat):
+            reset_target(dsl, args.schema)
+            command = [sys.executable, os.path.abspath(__file__), 'run-one', '--sqlite', args.sqlite,
+                       '--writer', writer, '--copy-format', args.copy_format, '--batch', batch,
+                       '--workers', str(args.workers)]
+            if args.dsn:
+                command += ['--dsn', args.dsn]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            result['attempt'] = attempt
+            results['runs'].append(result)
+            print(f"{writer:>5} batch={batch:<12} {result['wall_seconds']:>9.3f}s "
+                  f"{result['rows_per_second']:>12.1f} rows/s {result['peak_rss_mb']:>8.1f} MB")
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+def run_key(result: dict) -> tuple:
+    return result['writer'], result['copy_format'], result['batch'], result['workers']
+
+
+def best_runs(path: str) -> tuple:
+    with open(path, encoding='utf-8') as file:
+        results = json.load(file)
+    best = {}
+    for result in results['runs']:
+        key = run_key(result)
+        if key not in best or result['wall_seconds'] < best[key]['wall_seconds']:
+            best[key] = result
+    return results.get('commit'), best
+
+
+def compare(args: argparse.Namespace):
+    """Сравнение двух файлов результатов по лучшему прогону каждой конфигурации"""
+    base_commit, base = best_runs(args.base)
+    new_commit, new = best_runs(args.new)
+    print(f"base: {args.base} ({base_commit}), new: {args.new} ({new_commit})")
+    print(f"{'writer/format/batch/workers':<36} {'base s':>9} {'new s':>9} {'change':>8}")
+    for key in sorted(set(base) | set(new)):
+        label = '/'.join(str(part) for part in key)
+        before = base.get(key, {}).get('wall_seconds')
+        after = new.get(key, {}).get('wall_seconds')
+        change = f"{(after - before) / before * 100:+.1f}%" if before and after else '-'
+        print(f"{label:<36} {before or '-':>9} {after or '-':>9} {change:>8}")
+        for table in tables_models:
+            before_rate = base.get(key, {}).get('tables', {}).get(table, {}).get('rows_per_second')
+            after_rate = new.get(key, {}).get('tables', {}).get(table, {}).get('rows_per_second')
+            print(f"  {table:<34} {before_rate or '-':>9} {after_rate or '-':>9} rows/s")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Бенчмарк миграции SQLite -> PostgreSQL')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='прогнать миграцию во всех сочетаниях writer/batch')
+    run_parser.add_argument('--sqlite', required=True, help='исходный файл SQLite (см. generate_dataset.py)')
+    run_parser.add_argument('--dsn', default=None, help='строка подключения, по умолчанию из DB_* переменных')
+    run_parser.add_argument('--schema', default=SCHEMA_PATH, help='SQL со схемой content')
+    run_parser.add_argument('--writer', nargs='+', default=['copy', 'batch'], help='способы записи')
+    run_parser.add_argument('--copy-format', default='text')
+    run_parser.add_argument('--batch', nargs='+', default=['200', 'adaptive'], help='политики размера пачки')
+    run_parser.add_argument('--workers', type=int, default=3)
+    run_parser.add_argument('--repeat', type=int, default=1)
+    run_parser.add_argument('--output', default='benchmark.json')
+
+    one_parser = commands.add_parser('run-one', help=argparse.SUPPRESS)
+    one_parser.add_argument('--sqlite', required=True)
+    one_parser.add_argument('--dsn', default=None)
+    one_parser.add_argument('--writer', required=True)
+    one_parser.add_argument('--copy-format', default='text')
+    one_parser.add_argument('--batch', required=True)
+    one_parser.add_argument('--workers', type=int, default=3)
+
+    compare_parser = commands.add_parser('compare', help='сравнить два файла результатов')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'run-one':
+        dsl = {'dsn': args.dsn} if args.dsn else default_dsl()
+        print(json.dumps(run_one(args.sqlite, dsl, args.writer, args.copy_format, args.batch, args.workers)))
+    else:
+        compare(args)
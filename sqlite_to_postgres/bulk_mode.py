@@ -0,0 +1,212 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import psycopg2
+
+from config import logging
+
+SECONDARY_INDEXES = """
+SELECT t.relname, i.relname, pg_get_indexdef(i.oid)
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = 'content' AND t.relname = ANY(%s)
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.oid)
+ORDER BY t.relname, i.relname;
+"""
+
+FOREIGN_KEYS = """
+SELECT t.relname, c.conname, pg_get_constraintdef(c.oid), c.convalidated
+FROM pg_constraint c
+JOIN pg_class t ON t.oid = c.conrelid
+JOIN pg_class r ON r.oid = c.confrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE c.contype = 'f' AND n.nspname = 'content' AND (t.relname = ANY(%s) OR r.relname = ANY(%s))
+ORDER BY t.relname, c.conname;
+"""
+
+# триггеры счётчиков из миграции movies 0006_counters: без индексов связей каждый их запуск читал бы
+# таблицу связей целиком, поэтому на время загрузки они отключаются, а счётчики потом пересчитываются
+COUNTER_TRIGGERS = """
+SELECT t.relname, g.tgname
+FROM pg_trigger g
+JOIN pg_class t ON t.oid = g.tgrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = 'content' AND t.relname = ANY(%s) AND NOT g.tgisinternal
+  AND g.tgname LIKE '%%\\_counters\\_%%' AND g.tgenabled <> 'D'
+ORDER BY t.relname, g.tgname;
+"""
+
+
+class BulkLoadMode:
+    """Режим начальной загрузки: индексы и внешние ключи снимаются на время загрузки.
+
+    При входе запоминаются вторичные индексы (кроме обслуживающих PK/UNIQUE-ограничения)
+    и внешние ключи таблиц content, определения сохраняются в state_path и удаляются из базы.
+    Триггеры счётчиков отключаются, при выходе включаются, и счётчики пересчитываются
+    content.rebuild_counters().
+    С unlogged=True таблицы на время загрузки переводятся в UNLOGGED. При выходе, в том
+    числе после ошибки, индексы пересоздаются параллельно, внешние ключи добавляются как
+    NOT VALID и проверяются, после чего выполняется ANALYZE. Если процесс упал и схема не
+    восстановилась, state_path остаётся на диске и используется при следующем запуске
+    или при вызове restore().
+    """
+
+    def __init__(self, dsl: dict, tables, unlogged: bool = False, workers: int = 3,
+                 state_path: str = 'bulk_schema.json'):
+        self.__dsl = dsl
+        self.tables = list(tables)
+        self.unlogged = unlogged
+        self.workers = workers
+        self.state_path = state_path
+        self.state = None
+
+    def __connect(self):
+        return closing(psycopg2.connect(**self.__dsl))
+
+    def __execute(self, statement: str, args: tuple = None):
+        with self.__connect() as connection:
+            connection.autocommit = True
+            connection.cursor().execute(statement, args)
+
+    def record(self) -> dict:
+        if os.path.exists(self.state_path):
+            # прошлый запуск не восстановил схему - берём сохранённые определения, а не текущие
+            with open(self.state_path, encoding='utf-8') as file:
+                return json.load(file)
+
+        with self.__connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(SECONDARY_INDEXES, (self.tables,))
+            indexes = [{'table': table, 'name': name, 'definition': definition}
+                       for table, name, definition in cursor.fetchall()]
+            cursor.execute(FOREIGN_KEYS, (self.tables, self.tables))
+            foreign_keys = [{'table': table, 'name': name, 'definition': definition.replace(' NOT VALID', ''),
+                             'validated': validated}
+                            for table, name, definition, validated in cursor.fetchall()]
+            cursor.execute(COUNTER_TRIGGERS, (self.tables,))
+            triggers = [{'table': table, 'name': name} for table, name in cursor.fetchall()]
+
+        state = {'tables': self.tables, 'unlogged': self.unlogged, 'indexes': indexes, 'foreign_keys': foreign_keys,
+                 'triggers': triggers}
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file, ensure_ascii=False, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.state_path)
+        return state
+
+    def drop(self):
+        with self.__connect() as connection:
+            cursor = connection.cursor()
+            for constraint in self.state['foreign_keys']:
+                cursor.execute(f'ALTER TABLE content.{constraint["table"]} '
+                               f'DROP CONSTRAINT IF EXISTS "{constraint["name"]}";')
+            for index in self.state['indexes']:
+                cursor.execute(f'DROP INDEX IF EXISTS content."{index["name"]}";')
+            for trigger in self.state.get('triggers', []):
+                cursor.execute(f'ALTER TABLE content.{trigger["table"]} DISABLE TRIGGER "{trigger["name"]}";')
+            if self.state['unlogged']:
+                for table in self.state['tables']:
+                    cursor.execute(f'ALTER TABLE content.{table} SET UNLOGGED;')
+            connection.commit()
+        logging.info(f"Массовая загрузка: сняты индексы {len(self.state['indexes'])}, "
+                     f"внешние ключи {len(self.state['foreign_keys'])}, "
+                     f"отключены триггеры {len(self.state.get('triggers', []))}")
+
+    def __existing(self, query: str, names: list) -> set:
+        with self.__connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, (names,))
+            return {row[0] for row in cursor.fetchall()}
+
+    def restore(self):
+        if self.state is None and not os.path.exists(self.state_path):
+            logging.info('Массовая загрузка: нет сохранённой схемы для восстановления')
+            return
+
+        state = self.state or self.record()
+        errors = []
+
+        if state['unlogged']:
+            for table in state['tables']:
+                self.__execute(f'ALTER TABLE content.{table} SET LOGGED;')
+
+        existing = self.__existing(
+            "SELECT relname FROM pg_class WHERE relnamespace = 'content'::regnamespace AND relname = ANY(%s);",
+            [index['name'] for index in state['indexes']],
+        )
+        indexes = [index for index in state['indexes'] if index['name'] not in existing]
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            for index, error in zip(indexes, executor.map(self.__try, [index['definition'] for index in indexes])):
+                if error:
+                    errors.append(f"индекс {index['name']}: {error}")
+
+        existing = self.__existing(
+            "SELECT conname FROM pg_constraint WHERE connamespace = 'content'::regnamespace AND conname = ANY(%s);",
+            [constraint['name'] for constraint in state['foreign_keys']],
+        )
+        added = []
+        for constraint in state['foreign_keys']:
+            if constraint['name'] in existing:
+                continue
+            error = self.__try(f'ALTER TABLE content.{constraint["table"]} ADD CONSTRAINT "{constraint["name"]}" '
+                               f'{constraint["definition"]} NOT VALID;')
+            if error:
+                errors.append(f"внешний ключ {constraint['name']}: {error}")
+            elif constraint['validated']:
+                added.append(constraint)
+
+        # VALIDATE CONSTRAINT не блокирует запись и может идти параллельно
+        statements = [f'ALTER TABLE content.{constraint["table"]} VALIDATE CONSTRAINT "{constraint["name"]}";'
+                      for constraint in added]
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            for constraint, error in zip(added, executor.map(self.__try, statements)):
+                if error:
+                    errors.append(f"проверка внешнего ключа {constraint['name']}: {error}")
+
+        triggers = state.get('triggers', [])
+        for trigger in triggers:
+            error = self.__try(f'ALTER TABLE content.{trigger["table"]} ENABLE TRIGGER "{trigger["name"]}";')
+            if error:
+                errors.append(f"триггер {trigger['name']}: {error}")
+        if triggers:
+            # после индексов: пересчёт агрегирует таблицы связей
+            error = self.__try('SELECT content.rebuild_counters();')
+            if error:
+                errors.append(f"пересчёт счётчиков: {error}")
+
+        for table in state['tables']:
+            self.__execute(f'ANALYZE content.{table};')
+
+        if errors:
+            raise RuntimeError(f"Схема восстановлена не полностью: {'; '.join(errors)}")
+
+        os.remove(self.state_path)
+        self.state = None
+        logging.info('Массовая загрузка: индексы, внешние ключи и триггеры восстановлены, выполнен ANALYZE')
+
+    def __try(self, statement: str):
+        try:
+            self.__execute(statement)
+        except psycopg2.Error as e:
+            logging.exception(f"Ошибка восстановления схемы: {statement}")
+            return str(e).strip()
+        return None
+
+    def __enter__(self):
+        self.state = self.record()
+        try:
+            self.drop()
+        except Exception:
+            self.restore()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.restore()
+        return False
@@ -0,0 +1,45 @@
+import json
+import os
+import threading
+
+
+class Checkpoint:
+    """Последний загруженный rowid каждой таблицы в локальном JSON-файле.
+
+    Файл перезаписывается атомарно после каждой закоммиченной пачки, поэтому
+    после падения повторный запуск продолжает загрузку с места остановки.
+    """
+
+    def __init__(self, path: str = 'checkpoint.json'):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__state = self.__read()
+
+    def __read(self) -> dict:
+        if not os.path.exists(self.__path):
+            return {}
+        with open(self.__path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def __write(self):
+        tmp_path = f"{self.__path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.__state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.__path)
+
+    def get(self, table: str) -> int:
+        with self.__lock:
+            return self.__state.get(table, 0)
+
+    def save(self, table: str, last_key: int):
+        with self.__lock:
+            self.__state[table] = last_key
+            self.__write()
+
+    def clear(self):
+        with self.__lock:
+            self.__state = {}
+            if os.path.exists(self.__path):
+                os.remove(self.__path)
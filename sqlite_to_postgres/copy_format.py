@@ -0,0 +1,175 @@
+import io
+import struct
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+PG_EPOCH_DATE = date(2000, 1, 1)
+PG_EPOCH = datetime(2000, 1, 1)
+
+BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+BINARY_TRAILER = struct.pack('!h', -1)
+
+_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def parse_timestamp(value) -> datetime:
+    """Разбор timestamp из SQLite (`2021-06-16 20:14:09.221838+00`) в naive UTC datetime"""
+    if isinstance(value, datetime):
+        result = value
+    elif value.endswith('+00'):
+        # самый частый случай - уже UTC, смещение можно просто отбросить
+        return datetime.fromisoformat(value[:-3])
+    else:
+        value = value.strip()
+        # fromisoformat до Python 3.11 не понимает смещение вида `+00`
+        if len(value) > 3 and value[-3] in '+-' and value[-2:].isdigit():
+            value += ':00'
+        result = datetime.fromisoformat(value)
+    if result.tzinfo is not None:
+        result = result.astimezone(timezone.utc).replace(tzinfo=None)
+    return result
+
+
+def parse_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value.strip()[:10])
+
+
+def _text_value(value) -> str:
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return parse_timestamp(value).isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).translate(_TEXT_ESCAPES)
+
+
+def _text_escaped(value) -> str:
+    return '\\N' if value is None else str(value).translate(_TEXT_ESCAPES)
+
+
+def _text_plain(value) -> str:
+    # uuid, числа и даты из SQLite не содержат символов, требующих экранирования
+    if value is None:
+        return '\\N'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _text_timestamp(value) -> str:
+    # в timestamp без часового пояса Postgres отбрасывает смещение из текста, не пересчитывая время,
+    # поэтому, как и в бинарном формате, время приводится к UTC
+    if value is None:
+        return '\\N'
+    if isinstance(value, str) and value.endswith('+00'):
+        return value[:-3]
+    return parse_timestamp(value).isoformat(sep=' ')
+
+
+TEXT_FORMATTERS = {
+    'uuid': _text_plain,
+    'text': _text_escaped,
+    'float8': _text_plain,
+    'date': _text_plain,
+    'timestamp': _text_timestamp,
+}
+
+
+def to_text_buffer(rows, types: tuple = None) -> io.StringIO:
+    """Буфер для COPY ... WITH (FORMAT text): NULL как \\N, спецсимволы экранируются.
+
+    Если известны типы колонок, экранируются только текстовые колонки.
+    """
+    buffer = io.StringIO()
+    if types is None:
+        for row in rows:
+            buffer.write('\t'.join(_text_value(value) for value in row))
+            buffer.write('\n')
+    else:
+        formatters = [TEXT_FORMATTERS[pg_type] for pg_type in types]
+        for row in rows:
+            buffer.write('\t'.join([format_value(value) for format_value, value in zip(formatters, row)]))
+            buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+_NULL = struct.pack('!i', -1)
+_FIXED_16 = struct.pack('!i', 16)
+_pack_int = struct.Struct('!i').pack
+_pack_date = struct.Struct('!ii').pack
+_pack_int64 = struct.Struct('!iq').pack
+_pack_float8 = struct.Struct('!id').pack
+
+# Бинарные кодировщики возвращают поле целиком, вместе с префиксом длины.
+# Ссылки на фильмы и персон в таблицах связей многократно повторяются, поэтому
+# разбор uuid и дат кешируется
+
+
+@lru_cache(maxsize=1 << 16)
+def _encode_uuid(value) -> bytes:
+    if isinstance(value, uuid.UUID):
+        return _FIXED_16 + value.bytes
+    text = str(value)
+    if len(text) == 36:
+        return _FIXED_16 + bytes.fromhex(text.replace('-', ''))
+    return _FIXED_16 + uuid.UUID(text).bytes
+
+
+def _encode_text(value) -> bytes:
+    data = str(value).encode('utf-8')
+    return _pack_int(len(data)) + data
+
+
+def _encode_float8(value) -> bytes:
+    return _pack_float8(8, float(value))
+
+
+@lru_cache(maxsize=4096)
+def _encode_date(value) -> bytes:
+    return _pack_date(4, (parse_date(value) - PG_EPOCH_DATE).days)
+
+
+def _encode_timestamp(value) -> bytes:
+    delta: timedelta = parse_timestamp(value) - PG_EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return _pack_int64(8, micros)
+
+
+# created_at и updated_at одной строки обычно совпадают, и второе значение берётся из кеша.
+# В таблицах связей timestamp один и почти не повторяется: там кеш только замедляет кодирование
+_encode_timestamp_cached = lru_cache(maxsize=1024)(_encode_timestamp)
+
+
+BINARY_ENCODERS = {
+    'uuid': _encode_uuid,
+    'text': _encode_text,
+    'float8': _encode_float8,
+    'date': _encode_date,
+    'timestamp': _encode_timestamp,
+}
+
+
+def to_binary_buffer(rows, types: tuple) -> io.BytesIO:
+    """Буфер для COPY ... WITH (FORMAT binary); types - типы колонок Postgres в порядке полей"""
+    encoders = [BINARY_ENCODERS[pg_type] for pg_type in types]
+    if types.count('timestamp') > 1:
+        encoders = [_encode_timestamp_cached if pg_type == 'timestamp' else encode
+                    for pg_type, encode in zip(types, encoders)]
+    field_count = struct.pack('!h', len(encoders))
+
+    buffer = io.BytesIO()
+    buffer.write(BINARY_HEADER)
+    for row in rows:
+        buffer.write(field_count + b''.join([
+            _NULL if value is None else encode(value) for encode, value in zip(encoders, row)
+        ]))
+    buffer.write(BINARY_TRAILER)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,166 @@
+import argparse
+import random
+import sqlite3
+import uuid
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+SCHEMA = """
+CREATE TABLE genre (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE film_work (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    creation_date DATE,
+    certificate TEXT,
+    file_path TEXT,
+    rating FLOAT,
+    type TEXT not null,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE person (
+    id TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    birth_date DATE,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE genre_film_work (
+    id TEXT PRIMARY KEY,
+    film_work_id TEXT NOT NULL,
+    genre_id TEXT NOT NULL,
+    created_at timestamp with time zone
+);
+CREATE UNIQUE INDEX film_work_genre ON genre_film_work (film_work_id, genre_id);
+CREATE TABLE person_film_work (
+    id TEXT PRIMARY KEY,
+    film_work_id TEXT NOT NULL,
+    person_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    created_at timestamp with time zone
+);
+CREATE UNIQUE INDEX film_work_person_role ON person_film_work (film_work_id, person_id, role);
+"""
+
+WORDS = ('star', 'war', 'night', 'return', 'empire', 'lost', 'city', 'dark', 'light', 'hope', 'last', 'new',
+         'world', 'space', 'dream', 'king', 'river', 'storm', 'shadow', 'legend')
+ROLES = ('actor', 'actor', 'actor', 'actor', 'director', 'writer')
+CHUNK = 10000
+
+
+class Generator:
+    """Синтетические данные в формате db.sqlite.
+
+    films - число фильмов, остальные таблицы масштабируются от него. skew - показатель
+    степенного распределения популярности персон и жанров: 0 - равномерно, чем больше, тем
+    сильнее связи сосредоточены на немногих записях.
+    """
+
+    def __init__(self, films: int, skew: float = 1.0, seed: int = 0, persons_per_film: float = 2.0,
+                 credits_per_film: int = 6, genres_per_film: int = 2):
+        self.random = random.Random(seed)
+        self.films = films
+        self.persons = max(1, int(films * persons_per_film))
+        self.genres = max(26, films // 1000)
+        self.credits_per_film = credits_per_film
+        self.genres_per_film = genres_per_film
+        self.skew = skew
+        self.now = datetime(2021, 6, 16, tzinfo=timezone.utc)
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def timestamp(self) -> str:
+        moment = self.now + timedelta(seconds=self.random.randint(0, 86400 * 365))
+        return moment.strftime('%Y-%m-%d %H:%M:%S.%f+00')
+
+    def text(self, low: int, high: int) -> str:
+        return ' '.join(self.random.choice(WORDS) for _ in range(self.random.randint(low, high)))
+
+    def weights(self, count: int) -> list:
+        return list(accumulate(1 / (rank ** self.skew) for rank in range(1, count + 1)))
+
+    def rows(self, count: int, make):
+        chunk = []
+        for _ in range(count):
+            chunk.append(make())
+            if len(chunk) == CHUNK:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def film(self) -> tuple:
+        created = self.timestamp()
+        return (self.uuid(), self.text(1, 5).title(), self.text(0, 120) or None, None, None, None,
+                round(self.random.uniform(1, 10), 1), self.random.choice(('movie', 'tv_show')), created, created)
+
+    def person(self) -> tuple:
+        created = self.timestamp()
+        return self.uuid(), self.text(2, 3).title(), None, created, created
+
+    def genre(self) -> tuple:
+        created = self.timestamp()
+        return self.uuid(), self.text(1, 2).title(), self.text(0, 20) or None, created, created
+
+    def write(self, path: str):
+        with closing(sqlite3.connect(path)) as connection:
+            connection.executescript(SCHEMA)
+            film_ids = self.__fill(connection, 'film_work', self.films, self.film)
+            genre_ids = self.__fill(connection, 'genre', self.genres, self.genre)
+            person_ids = self.__fill(connection, 'person', self.persons, self.person)
+
+            genre_weights = self.weights(len(genre_ids))
+            person_weights = self.weights(len(person_ids))
+            for chunk in self.__chunks(film_ids):
+                links = []
+                for film_id in chunk:
+                    for genre_id in self.random.choices(genre_ids, cum_weights=genre_weights,
+                                                        k=self.genres_per_film):
+                        links.append((self.uuid(), film_id, genre_id, self.timestamp()))
+                connection.executemany('INSERT OR IGNORE INTO genre_film_work VALUES (?, ?, ?, ?)', links)
+
+                credits = []
+                for film_id in chunk:
+                    for person_id in self.random.choices(person_ids, cum_weights=person_weights,
+                                                         k=self.credits_per_film):
+                        credits.append((self.uuid(), film_id, person_id, self.random.choice(ROLES),
+                                        self.timestamp()))
+                connection.executemany('INSERT OR IGNORE INTO person_film_work VALUES (?, ?, ?, ?, ?)', credits)
+                connection.commit()
+
+    def __fill(self, connection: sqlite3.Connection, table: str, count: int, make) -> list:
+        ids = []
+        for chunk in self.rows(count, make):
+            args = ', '.join('?' * len(chunk[0]))
+            connection.executemany(f'INSERT INTO {table} VALUES ({args})', chunk)
+            ids.extend(row[0] for row in chunk)
+        connection.commit()
+        return ids
+
+    @staticmethod
+    def __chunks(items: list):
+        for start in range(0, len(items), CHUNK):
+            yield items[start:start + CHUNK]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Генерация синтетического SQLite для бенчмарка миграции')
+    parser.add_argument('path', help='куда записать файл SQLite')
+    parser.add_argument('--films', type=int, default=10000, help='число фильмов')
+    parser.add_argument('--skew', type=float, default=1.0, help='перекос популярности персон и жанров')
+    parser.add_argument('--credits-per-film', type=int, default=6)
+    parser.add_argument('--genres-per-film', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    Generator(args.films, args.skew, args.seed, credits_per_film=args.credits_per_film,
+              genres_per_film=args.genres_per_film).write(args.path)
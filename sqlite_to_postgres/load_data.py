@@ -1,26 +1,100 @@
+import argparse
+import copy
+import io
 import sqlite3
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, nullcontext
 from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
 
 import psycopg2
 from psycopg2.extensions import connection as _connection
 from psycopg2.extras import DictCursor, execute_batch
 
+from batching import batch_policy, estimate_bytes
+from bulk_mode import BulkLoadMode
+from checkpoint import Checkpoint
 from config import env, logging
-from models import FilmWork, Genre, GenreFilmWork, Person, PersonFilmWork
+from copy_format import to_binary_buffer, to_text_buffer
+from metrics import MigrationMetrics
+from models import FilmWork, Genre, GenreFilmWork, Person, PersonFilmWork, source_fields
+from pipeline import Pipeline
+from scheduler import run_graph, topological_order
+from sync import Synchronizer, staging_table
+
+
+class PreparedBatch:
+    """Пачка, готовая к записи: payload - буфер COPY или список кортежей"""
+    __slots__ = ['payload', 'rows', 'size_bytes']
+
+    def __init__(self, payload, rows: int, size_bytes: int):
+        self.payload = payload
+        self.rows = rows
+        self.size_bytes = size_bytes
+
+    def __len__(self):
+        return self.rows
 
 
 class PostgresSaver:
-    def __init__(self, connection: _connection):
+    """Запись пачек в Postgres.
+
+    mode='copy' - пачка передаётся через COPY во временную таблицу и переносится одним
+    INSERT ... SELECT ... ON CONFLICT; mode='batch' - прежняя запись через execute_batch;
+    mode='stage' - COPY прямо в staging-таблицу режима синхронизации (см. sync.Synchronizer).
+    """
+    modes = ('copy', 'batch', 'stage')
+    copy_formats = ('text', 'binary')
+
+    def __init__(self, connection: _connection, mode: str = 'copy', copy_format: str = 'text'):
+        if mode not in self.modes:
+            raise ValueError(f"Неизвестный режим записи: {mode}")
+        if copy_format not in self.copy_formats:
+            raise ValueError(f"Неизвестный формат COPY: {copy_format}")
+
         self.__connection = connection
+        self.__mode = mode
+        self.__copy_format = copy_format
+        self.__temp_tables = set()
 
     def save_all_data(self, table: str, model: dataclass, data: list):
-        cursor: DictCursor = self.__connection.cursor()
-
+        """Записывает пачку; возвращает число вставленных строк или None, если оно неизвестно"""
         values = []
         for entry in data:
             values.append(entry.get_values())
 
+        if not values:
+            return 0
+        return self.save_prepared(table, model, self.prepare(model, values))
+
+    def prepare(self, model: dataclass, rows: list) -> PreparedBatch:
+        """Готовит пачку кортежей к записи: для COPY - сразу буфер, для execute_batch - сами кортежи"""
+        if self.__mode == 'batch':
+            return PreparedBatch(rows, len(rows), estimate_bytes(rows))
+
+        if self.__copy_format == 'binary':
+            buffer = to_binary_buffer(rows, model.get_types())
+            return PreparedBatch(buffer, len(rows), buffer.getbuffer().nbytes)
+
+        buffer = to_text_buffer(rows, model.get_types())
+        size = buffer.seek(0, io.SEEK_END)
+        buffer.seek(0)
+        return PreparedBatch(buffer, len(rows), size)
+
+    def save_prepared(self, table: str, model: dataclass, batch: PreparedBatch):
+        if self.__mode == 'copy':
+            return self.copy_buffer(table, model, batch.payload)
+        if self.__mode == 'stage':
+            return self.copy_staged(table, model, batch.payload)
+        return self.insert_values(table, model, batch.payload)
+
+    def insert_values(self, table: str, model: dataclass, values: list):
+        # execute_batch сообщает rowcount только последней страницы, поэтому число вставленных неизвестно
+        cursor: DictCursor = self.__connection.cursor()
+
         fields: str = model.get_fields_name()
         args: str = model.get_args()
 
@@ -29,59 +103,345 @@ class PostgresSaver:
             execute_batch(cursor, command, values)
             self.__connection.commit()
         except Exception as e:
+            self.__connection.rollback()
             logging.exception(f"Ошибка записи в PostgreSQL: {e}")
+            raise
+
+    def copy_buffer(self, table: str, model: dataclass, buffer) -> int:
+        cursor: DictCursor = self.__connection.cursor()
+
+        fields: str = model.get_fields_name()
+        temp_table = f"tmp_{table}"
+
+        try:
+            if temp_table not in self.__temp_tables:
+                cursor.execute(f"""CREATE TEMP TABLE IF NOT EXISTS {temp_table}
+                                   (LIKE content.{table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;""")
+                self.__temp_tables.add(temp_table)
+
+            cursor.copy_expert(f"COPY {temp_table} ({fields}) FROM STDIN WITH (FORMAT {self.__copy_format})", buffer)
+            cursor.execute(f"""INSERT INTO content.{table} ({fields}) SELECT {fields} FROM {temp_table}
+                               ON CONFLICT (id) DO NOTHING;""")
+            inserted = cursor.rowcount
+            self.__connection.commit()
+            return inserted
+        except Exception as e:
+            self.__connection.rollback()
+            # временная таблица, созданная в откатившейся транзакции, пропадает вместе с ней
+            self.__temp_tables.discard(temp_table)
+            logging.exception(f"Ошибка записи в PostgreSQL через COPY: {e}")
+            raise
+
+    def copy_staged(self, table: str, model: dataclass, buffer):
+        # вставленные и обновлённые строки считает Synchronizer.apply, здесь число неизвестно
+        cursor: DictCursor = self.__connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY content.{staging_table(table)} ({model.get_fields_name()}) "
+                               f"FROM STDIN WITH (FORMAT {self.__copy_format})", buffer)
+            self.__connection.commit()
+        except Exception as e:
+            self.__connection.rollback()
+            logging.exception(f"Ошибка записи в staging-таблицу PostgreSQL: {e}")
+            raise
+
+
+def open_sqlite(path: str, immutable: bool = True, mmap_mb: int = 256, cache_mb: int = 64) -> sqlite3.Connection:
+    """Соединение с SQLite только для чтения.
+
+    immutable=True отключает блокировки и проверку изменений файла: так можно читать только файл,
+    который никто не меняет во время загрузки. mmap_mb и cache_mb - объём mmap и кеша страниц.
+    """
+    uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+    connection = sqlite3.connect(uri, uri=True)
+    connection.execute(f"PRAGMA mmap_size = {mmap_mb * 1024 * 1024}")
+    connection.execute(f"PRAGMA cache_size = {-cache_mb * 1024}")
+    return connection
 
 
 class SQLiteLoader:
     def __init__(self, connection: sqlite3.Connection):
         self.__connection = connection
 
-    def get_count(self, table) -> int:
+    def read_batches(self, table: str, batch, after: int = 0, fields: str = '*', until: int = None):
+        """Чтение таблицы пачками по rowid (keyset): каждая пачка - (последний rowid, строки).
+
+        batch - политика размера пачки, размер перечитывается перед каждым запросом.
+        until - последний rowid диапазона включительно, None - до конца таблицы.
+        """
         cursor = self.__connection.cursor()
-        return cursor.execute(f"SELECT Count() FROM {table}").fetchone()[0]
+        upper = "" if until is None else f"AND rowid <= {int(until)}"
+        while True:
+            rows = cursor.execute(
+                f"SELECT rowid, {fields} FROM {table} WHERE rowid > ? {upper} ORDER BY rowid LIMIT ?",
+                (after, batch.size)
+            ).fetchall()
+            if not rows:
+                return
+            after = rows[-1][0]
+            yield after, [row[1:] for row in rows]
 
-    def to_postgres(self, pg, table, model, batch) -> list:
+    def get_last_key(self, table: str) -> int:
         cursor = self.__connection.cursor()
+        return cursor.execute(f"SELECT max(rowid) FROM {table}").fetchone()[0] or 0
 
-        try:
-            count: int = self.get_count(table)
-            i = 0
-            command = cursor.execute(f"SELECT * FROM {table}")
-            while i < count:
-                data = []
-                for row in command.fetchmany(batch):
-                    data.append(model(*row))
+    def shard_ranges(self, table: str, shards: int) -> list:
+        """Делит таблицу на shards непересекающихся диапазонов rowid (after, until] равной ширины"""
+        cursor = self.__connection.cursor()
+        low, high = cursor.execute(f"SELECT min(rowid), max(rowid) FROM {table}").fetchone()
+        if low is None:
+            return []
+        width = -(-(high - low + 1) // shards)
+        return [(start, min(high, start + width)) for start in range(low - 1, high, width)]
+
+    def to_postgres(self, pg, table, model, batch, checkpoint: Checkpoint = None,
+                    metrics: MigrationMetrics = None, validate: bool = False, key_range: tuple = None) -> list:
+        """Перенос таблицы: пачки строк SQLite сразу превращаются в буфер для записи.
 
-                pg.save_all_data(table, model, data)
-                i += batch
+        С validate=True каждая строка сначала проходит через dataclass модели.
+        key_range=(after, until) - перенос только диапазона rowid; прогресс и метрики диапазона
+        ведутся под именем `таблица[after:until]`.
+        """
+        batch = batch_policy(batch)
+        low, until = key_range or (0, None)
+        name = table if key_range is None else f"{table}[{low}:{until}]"
+        after = max(low, checkpoint.get(name)) if checkpoint else low
+        if after > low:
+            logging.info(f"Таблица {name}: продолжение загрузки после rowid {after}")
+
+        last_key = self.get_last_key(table) if until is None else until
+        table_metrics = metrics.table(name, last_key, after) if metrics else None
+
+        def transform(rows: list) -> PreparedBatch:
+            if validate:
+                rows = [model(*row).get_values() for row in rows]
+            return pg.prepare(model, rows)
+
+        def write(last_key: int, prepared: PreparedBatch):
+            started = time.perf_counter()
+            inserted = pg.save_prepared(table, model, prepared)
+            batch.update(prepared.rows, time.perf_counter() - started, prepared.size_bytes)
+            if checkpoint:
+                checkpoint.save(name, last_key)
+            if table_metrics:
+                table_metrics.add_written(last_key, prepared.rows, inserted)
+
+        try:
+            observer = table_metrics.add_stage if table_metrics else None
+            reader = self.read_batches(table, batch, after, source_fields(model), until)
+            Pipeline(reader, transform, write, observer=observer).run(name)
+            logging.info(f"Таблица {name}: итоговый размер пачки {batch}")
+            if table_metrics:
+                table_metrics.finish()
 
         except Exception as e:
-            logging.exception(f"Ошибка чтения из БД Sqlite3:: {e}")
+            logging.exception(f"Ошибка загрузки таблицы {name} из БД Sqlite3: {e}")
+            raise
 
-            self.__connection.close()
-            sys.exit()
 
+tables_models = {
+    'film_work': FilmWork,
+    'genre': Genre,
+    'genre_film_work': GenreFilmWork,
+    'person': Person,
+    'person_film_work': PersonFilmWork,
+}
 
-def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection):
+# Зависимости по внешним ключам из schema_design/db_schema.sql
+table_dependencies = {
+    'film_work': (),
+    'genre': (),
+    'person': (),
+    'genre_film_work': ('film_work', 'genre'),
+    'person_film_work': ('film_work', 'person'),
+}
+
+
+def table_batch(batch, table: str):
+    """Политика пачки для таблицы: batch - общая политика или словарь {таблица: политика}"""
+    if isinstance(batch, dict):
+        return batch_policy(batch.get(table, 200))
+    return batch_policy(batch)
+
+
+def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection, batch=200,
+                     checkpoint: Checkpoint = None, writer: dict = None, metrics: MigrationMetrics = None,
+                     validate: bool = False):
     """Основной метод загрузки данных из SQLite в Postgres"""
-    postgres_saver = PostgresSaver(pg_conn)
+    postgres_saver = PostgresSaver(pg_conn, **(writer or {}))
     sqlite_loader = SQLiteLoader(connection)
 
-    batch = 200
-    tables_models = [
-        ['film_work', FilmWork],
-        ['genre', Genre],
-        ['genre_film_work', GenreFilmWork],
-        ['person', Person],
-        ['person_film_work', PersonFilmWork]
-    ]
+    for table in topological_order(table_dependencies):
+        sqlite_loader.to_postgres(postgres_saver, table, tables_models[table], table_batch(batch, table), checkpoint,
+                                  metrics, validate)
+
+    if checkpoint:
+        checkpoint.clear()
+
+
+def load_range(sqlite_path: str, dsl: dict, table: str, batch=200, checkpoint: Checkpoint = None,
+               writer: dict = None, metrics: MigrationMetrics = None, validate: bool = False,
+               key_range: tuple = None, sqlite_options: dict = None):
+    """Загрузка таблицы или диапазона rowid на собственных соединениях с SQLite и Postgres"""
+    with closing(open_sqlite(sqlite_path, **(sqlite_options or {}))) as sqlite_conn, \
+            closing(psycopg2.connect(**dsl, cursor_factory=DictCursor)) as pg_conn:
+        postgres_saver = PostgresSaver(pg_conn, **(writer or {}))
+        SQLiteLoader(sqlite_conn).to_postgres(postgres_saver, table, tables_models[table], batch, checkpoint,
+                                              metrics, validate, key_range)
+
+
+def load_table(sqlite_path: str, dsl: dict, table: str, batch=200, checkpoint: Checkpoint = None,
+               writer: dict = None, metrics: MigrationMetrics = None, validate: bool = False,
+               shards: int = 1, sqlite_options: dict = None):
+    """Загрузка одной таблицы; с shards > 1 - параллельно по непересекающимся диапазонам rowid.
+
+    Каждый диапазон читается своим соединением с SQLite и пишется своим соединением с Postgres,
+    со своей копией политики пачки. Чекпоинт ведётся по диапазонам, поэтому продолжить прерванную
+    загрузку можно только с тем же числом диапазонов.
+    """
+    if shards <= 1:
+        load_range(sqlite_path, dsl, table, batch, checkpoint, writer, metrics, validate,
+                   sqlite_options=sqlite_options)
+        return
+
+    with closing(open_sqlite(sqlite_path, **(sqlite_options or {}))) as sqlite_conn:
+        ranges = SQLiteLoader(sqlite_conn).shard_ranges(table, shards)
+    logging.info(f"Таблица {table}: {len(ranges)} диапазонов rowid")
+
+    with ThreadPoolExecutor(max(1, len(ranges)), thread_name_prefix=f"{table}-shard") as pool:
+        futures = [
+            pool.submit(load_range, sqlite_path, dsl, table, copy.deepcopy(batch_policy(batch)), checkpoint, writer,
+                        metrics, validate, key_range, sqlite_options)
+            for key_range in ranges
+        ]
+        for future in futures:
+            future.result()
+
+
+def table_shards(shards, table: str) -> int:
+    """Число диапазонов для таблицы: shards - общее число или словарь {таблица: число}"""
+    if isinstance(shards, dict):
+        return shards.get(table, 1)
+    return shards
 
-    for table in tables_models:
-        sqlite_loader.to_postgres(postgres_saver, table[0], table[1], batch)
+
+def load_parallel(sqlite_path: str, dsl: dict, workers: int = 3, batch=200, checkpoint: Checkpoint = None,
+                  writer: dict = None, metrics: MigrationMetrics = None, validate: bool = False,
+                  shards=1, sqlite_options: dict = None):
+    """Параллельная загрузка: независимые таблицы грузятся одновременно, связи - после родителей.
+
+    Если передан checkpoint, каждая таблица продолжает с последнего закоммиченного rowid,
+    а после успешной миграции checkpoint очищается. shards - число диапазонов rowid на таблицу,
+    они грузятся параллельно сверх workers.
+    """
+    tasks = {
+        table: partial(load_table, sqlite_path, dsl, table, table_batch(batch, table), checkpoint, writer, metrics,
+                       validate, table_shards(shards, table), sqlite_options)
+        for table in tables_models
+    }
+    run_graph(tasks, table_dependencies, workers)
+
+    if checkpoint:
+        checkpoint.clear()
+
+
+def sync_parallel(sqlite_path: str, dsl: dict, workers: int = 3, batch=200, writer: dict = None,
+                  metrics: MigrationMetrics = None, validate: bool = False, shards=1, sqlite_options: dict = None,
+                  delete_missing: bool = False) -> dict:
+    """Синхронизация с обновлённым источником: весь SQLite через staging-таблицы и один upsert на таблицу.
+
+    Чекпоинт не используется: staging-таблицы очищаются в начале, источник загружается в них целиком.
+    """
+    synchronizer = Synchronizer(dsl, tables_models, table_dependencies, delete_missing)
+    synchronizer.prepare()
+    load_parallel(sqlite_path, dsl, workers=workers, batch=batch, writer={**(writer or {}), 'mode': 'stage'},
+                  metrics=metrics, validate=validate, shards=shards, sqlite_options=sqlite_options)
+    counts = synchronizer.apply()
+    if metrics:
+        for table, table_counts in counts.items():
+            metrics.add_sync(table, table_counts)
+    return counts
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Перенос данных из SQLite в PostgreSQL')
+    parser.add_argument('--sqlite', default='db.sqlite', help='путь к файлу SQLite')
+    parser.add_argument('--dsn', default=None,
+                        help='строка подключения к PostgreSQL, по умолчанию собирается из DB_* переменных окружения')
+    parser.add_argument('--workers', type=int, default=env.int('LOAD_WORKERS', default=3),
+                        help='число таблиц, загружаемых одновременно')
+    parser.add_argument('--batch', default='adaptive',
+                        help='размер пачки: число, adaptive или adaptive:<начальный размер>')
+    parser.add_argument('--table-batch', action='append', default=[], metavar='TABLE=POLICY',
+                        help='политика пачки для отдельной таблицы, например person_film_work=5000')
+    parser.add_argument('--target-latency', type=float, default=0.5,
+                        help='целевое время записи одной пачки для adaptive, секунды')
+    parser.add_argument('--max-batch-mb', type=float, default=16, help='потолок объёма пачки для adaptive, МБ')
+    parser.add_argument('--writer', choices=('copy', 'batch'), default='copy', help='способ записи в PostgreSQL')
+    parser.add_argument('--copy-format', choices=PostgresSaver.copy_formats, default='text', help='формат COPY')
+    parser.add_argument('--checkpoint', default='checkpoint.json', help='файл с прогрессом загрузки')
+    parser.add_argument('--sync', action='store_true',
+                        help='синхронизировать изменения: staging-таблицы и upsert по updated_at вместо DO NOTHING')
+    parser.add_argument('--delete-missing', action='store_true',
+                        help='в режиме --sync удалять строки, которых нет в источнике')
+    parser.add_argument('--bulk', action='store_true',
+                        help='снять индексы и внешние ключи на время загрузки и пересоздать после неё')
+    parser.add_argument('--unlogged', action='store_true', help='в режиме --bulk переводить таблицы в UNLOGGED')
+    parser.add_argument('--restore-schema', action='store_true',
+                        help='только восстановить индексы и ключи после упавшего запуска с --bulk')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='число диапазонов rowid, которые читаются и пишутся параллельно внутри таблицы')
+    parser.add_argument('--table-shards', action='append', default=[], metavar='TABLE=N',
+                        help='число диапазонов для отдельной таблицы, например person_film_work=8')
+    parser.add_argument('--immutable', action=argparse.BooleanOptionalAction, default=True,
+                        help='открывать SQLite как неизменяемый файл (без блокировок)')
+    parser.add_argument('--sqlite-mmap-mb', type=int, default=256, help='объём mmap для чтения SQLite, МБ')
+    parser.add_argument('--sqlite-cache-mb', type=int, default=64, help='кеш страниц SQLite на соединение, МБ')
+    parser.add_argument('--validate', action='store_true', help='пропускать каждую строку через dataclass модели')
+    parser.add_argument('--report', default=None, help='куда сохранить итоговый JSON-отчёт с метриками')
+    parser.add_argument('--prometheus', default=None, help='куда сохранить метрики в текстовом формате Prometheus')
+    parser.add_argument('--progress', action=argparse.BooleanOptionalAction, default=sys.stderr.isatty(),
+                        help='печатать строку прогресса с ETA')
+    return parser.parse_args(argv)
+
+
+def shards_from_args(args: argparse.Namespace) -> dict:
+    shards = {table: args.shards for table in tables_models}
+    for item in args.table_shards:
+        table, _, count = item.partition('=')
+        if table not in tables_models or not count.isdigit() or int(count) < 1:
+            raise ValueError(f"Неверное число диапазонов для таблицы: {item}")
+        shards[table] = int(count)
+    return shards
+
+
+def sqlite_options_from_args(args: argparse.Namespace) -> dict:
+    return {'immutable': args.immutable, 'mmap_mb': args.sqlite_mmap_mb, 'cache_mb': args.sqlite_cache_mb}
+
+
+def batches_from_args(args: argparse.Namespace) -> dict:
+    overrides = {}
+    for item in args.table_batch:
+        table, _, spec = item.partition('=')
+        if table not in tables_models or not spec:
+            raise ValueError(f"Неверная политика пачки для таблицы: {item}")
+        overrides[table] = spec
+
+    max_bytes = int(args.max_batch_mb * 1024 * 1024)
+    return {
+        table: batch_policy(overrides.get(table, args.batch), args.target_latency, max_bytes)
+        for table in tables_models
+    }
 
 
 if __name__ == '__main__':
-    dsl = {
+    args = parse_args()
+
+    if args.dsn:
+        dsl = {'dsn': args.dsn}
+    else:
+        dsl = {
             'dbname': env('DB_NAME'),
             'user': env('DB_USER'),
             'password': env('DB_PASSWORD'),
@@ -89,7 +449,38 @@ if __name__ == '__main__':
             'port': env('DB_PORT')
         }
 
-    with sqlite3.connect('db.sqlite') as sqlite_conn, psycopg2.connect(**dsl, cursor_factory=DictCursor) as pg_conn:
-        load_from_sqlite(sqlite_conn, pg_conn)
+    bulk_mode = BulkLoadMode(dsl, tables_models, unlogged=args.unlogged, workers=args.workers)
+    if args.restore_schema:
+        bulk_mode.restore()
+        sys.exit()
+
+    if args.sync and args.bulk:
+        logging.error('--sync и --bulk несовместимы: --bulk рассчитан на загрузку в пустую базу')
+        sys.exit(2)
+
+    metrics = MigrationMetrics()
+    if args.progress:
+        metrics.start_progress()
 
-    sqlite_conn.close()
+    try:
+        if args.sync:
+            sync_parallel(args.sqlite, dsl, workers=args.workers, batch=batches_from_args(args),
+                          writer={'copy_format': args.copy_format}, metrics=metrics, validate=args.validate,
+                          shards=shards_from_args(args), sqlite_options=sqlite_options_from_args(args),
+                          delete_missing=args.delete_missing)
+        else:
+            with bulk_mode if args.bulk else nullcontext():
+                load_parallel(args.sqlite, dsl, workers=args.workers, batch=batches_from_args(args),
+                              checkpoint=Checkpoint(args.checkpoint),
+                              writer={'mode': args.writer, 'copy_format': args.copy_format}, metrics=metrics,
+                              validate=args.validate, shards=shards_from_args(args),
+                              sqlite_options=sqlite_options_from_args(args))
+    except Exception:
+        logging.exception('Миграция завершилась с ошибкой')
+        sys.exit(1)
+    finally:
+        metrics.stop_progress()
+        if args.report:
+            metrics.write_json(args.report)
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
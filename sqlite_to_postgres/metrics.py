@@ -0,0 +1,208 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+
+def current_rss_mb() -> float:
+    """Текущий RSS процесса; вне Linux - пиковый"""
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux - килобайты, в macOS - байты
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+class TableMetrics:
+    def __init__(self, name: str, last_key: int = 0, start_key: int = 0):
+        self.name = name
+        self.last_key = last_key
+        self.key = start_key
+        self.start_key = start_key
+        self.started = time.perf_counter()
+        self.finished = None
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.rows_unknown = 0
+        self.seconds = {'read': 0.0, 'transform': 0.0, 'write': 0.0}
+        self.batches = {'read': [], 'transform': [], 'write': []}
+        self.inserted = []
+
+    def add_stage(self, stage: str, seconds: float, rows: int):
+        self.seconds[stage] += seconds
+        self.batches[stage].append(round(seconds, 6))
+        if stage == 'read':
+            self.rows_read += rows
+
+    def add_written(self, last_key: int, rows: int, inserted: int = None):
+        """inserted - число реально вставленных строк, None если writer его не сообщает"""
+        self.key = last_key
+        self.inserted.append(inserted)
+        if inserted is None:
+            self.rows_unknown += rows
+        else:
+            self.rows_written += inserted
+            self.rows_skipped += rows - inserted
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def progress(self) -> float:
+        if self.finished:
+            return 1.0
+        span = self.last_key - self.start_key
+        return min(1.0, (self.key - self.start_key) / span) if span > 0 else 0.0
+
+    @property
+    def eta(self) -> float:
+        progress = self.progress
+        if self.finished or progress <= 0:
+            return 0.0
+        return self.elapsed * (1 - progress) / progress
+
+    def report(self) -> dict:
+        batches = []
+        for index, write in enumerate(self.batches['write']):
+            batches.append({
+                'read_seconds': self.__at('read', index),
+                'transform_seconds': self.__at('transform', index),
+                'write_seconds': write,
+                'inserted': self.inserted[index] if index < len(self.inserted) else None,
+            })
+        return {
+            'elapsed_seconds': round(self.elapsed, 3),
+            'finished': self.finished is not None,
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'rows_skipped': self.rows_skipped,
+            'rows_unknown': self.rows_unknown,
+            'read_seconds': round(self.seconds['read'], 3),
+            'transform_seconds': round(self.seconds['transform'], 3),
+            'write_seconds': round(self.seconds['write'], 3),
+            'batches': batches,
+        }
+
+    def __at(self, stage: str, index: int):
+        values = self.batches[stage]
+        return values[index] if index < len(values) else None
+
+
+class MigrationMetrics:
+    """Метрики миграции: время стадий и число строк по таблицам и пачкам, RSS, прогресс.
+
+    Умеет печатать строку прогресса с ETA, сохранять итоговый JSON-отчёт и
+    файл в текстовом формате Prometheus (для node_exporter textfile collector).
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.sync = {}
+        self.started = time.perf_counter()
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__progress_thread = None
+
+    def table(self, name: str, last_key: int = 0, start_key: int = 0) -> TableMetrics:
+        with self.__lock:
+            metrics = TableMetrics(name, last_key, start_key)
+            self.tables[name] = metrics
+            return metrics
+
+    def add_sync(self, table: str, counts: dict):
+        """Итог режима синхронизации по таблице: source, inserted, updated, unchanged, deleted"""
+        with self.__lock:
+            self.sync[table] = dict(counts)
+
+    def progress_line(self) -> str:
+        with self.__lock:
+            tables = list(self.tables.values())
+        parts = [f"{table.name} {table.progress * 100:.0f}%" for table in tables]
+        rows = sum(table.rows_read for table in tables)
+        elapsed = time.perf_counter() - self.started
+        eta = max((table.eta for table in tables), default=0.0)
+        return (f"{' | '.join(parts)} | {rows / elapsed if elapsed else 0:.0f} строк/с | "
+                f"RSS {current_rss_mb():.0f} MB | ETA {eta:.0f}s")
+
+    def start_progress(self, interval: float = 1.0, stream=sys.stderr):
+        def loop():
+            while not self.__stop.wait(interval):
+                stream.write('\r' + self.progress_line())
+                stream.flush()
+            stream.write('\r' + self.progress_line() + '\n')
+            stream.flush()
+
+        self.__progress_thread = threading.Thread(target=loop, name='progress', daemon=True)
+        self.__progress_thread.start()
+
+    def stop_progress(self):
+        self.__stop.set()
+        if self.__progress_thread:
+            self.__progress_thread.join()
+
+    def report(self) -> dict:
+        with self.__lock:
+            tables = dict(self.tables)
+            sync = dict(self.sync)
+        report = {
+            'elapsed_seconds': round(time.perf_counter() - self.started, 3),
+            'rss_mb': round(current_rss_mb(), 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'tables': {name: table.report() for name, table in tables.items()},
+        }
+        if sync:
+            report['sync'] = sync
+        return report
+
+    def write_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path: str):
+        report = self.report()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        tables = report['tables']
+        for column, help_text in (('rows_read', 'Rows read from SQLite'),
+                                  ('rows_written', 'Rows inserted into PostgreSQL'),
+                                  ('rows_skipped', 'Rows skipped by ON CONFLICT')):
+            metric(f"migration_{column}_total", 'counter', help_text,
+                   [({'table': name}, table[column]) for name, table in tables.items()])
+        metric('migration_stage_seconds_total', 'counter', 'Busy time of a pipeline stage',
+               [({'table': name, 'stage': stage}, table[f'{stage}_seconds'])
+                for name, table in tables.items() for stage in ('read', 'transform', 'write')])
+        metric('migration_table_elapsed_seconds', 'gauge', 'Wall time spent on a table',
+               [({'table': name}, table['elapsed_seconds']) for name, table in tables.items()])
+        if 'sync' in report:
+            metric('migration_sync_rows', 'gauge', 'Rows by sync outcome',
+                   [({'table': name, 'result': result}, value)
+                    for name, counts in report['sync'].items() for result, value in counts.items()])
+        metric('migration_elapsed_seconds', 'gauge', 'Wall time of the migration', [({}, report['elapsed_seconds'])])
+        metric('migration_peak_rss_megabytes', 'gauge', 'Peak RSS of the loader', [({}, report['peak_rss_mb'])])
+
+        # textfile collector читает файл целиком, поэтому пишем во временный и переименовываем
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
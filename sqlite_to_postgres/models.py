@@ -3,10 +3,36 @@ from dataclasses import dataclass
 from datetime import datetime
 
 
+@dataclass(frozen=True)
+class Column:
+    """Соответствие колонки SQLite колонке Postgres и её тип для COPY"""
+    __slots__ = ['source', 'target', 'type']
+
+    source: str
+    target: str
+    type: str
+
+
+def source_fields(model) -> str:
+    return ', '.join(column.source for column in model.columns)
+
+
 @dataclass(frozen=True)
 class FilmWork:
     __slots__ = ['id', 'title', 'description', 'creation_date', 'certificate', 'file_path', 'rating', 'type',
                  'created_at', 'updated_at']
+    columns = (
+        Column('id', 'id', 'uuid'),
+        Column('title', 'title', 'text'),
+        Column('description', 'description', 'text'),
+        Column('creation_date', 'creation_date', 'date'),
+        Column('certificate', 'certificate', 'text'),
+        Column('file_path', 'file_path', 'text'),
+        Column('rating', 'rating', 'float8'),
+        Column('type', 'type', 'text'),
+        Column('created_at', 'created_at', 'timestamp'),
+        Column('updated_at', 'updated_at', 'timestamp'),
+    )
 
     id: uuid
     title: str
@@ -21,7 +47,7 @@ class FilmWork:
 
     def get_values(self) -> tuple:
         return (self.id, self.title, self.description, self.creation_date, self.certificate, self.file_path,
-                self.rating, self.type, self.creation_date, self.updated_at)
+                self.rating, self.type, self.created_at, self.updated_at)
 
     @classmethod
     def get_fields_name(cls) -> str:
@@ -31,10 +57,21 @@ class FilmWork:
     def get_args(cls) -> str:
         return "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s"
 
+    @classmethod
+    def get_types(cls) -> tuple:
+        return tuple(column.type for column in cls.columns)
+
 
 @dataclass(frozen=True)
 class Genre:
     __slots__ = ['id', 'name', 'description', 'created_at',  'updated_at']
+    columns = (
+        Column('id', 'id', 'uuid'),
+        Column('name', 'name', 'text'),
+        Column('description', 'description', 'text'),
+        Column('created_at', 'created_at', 'timestamp'),
+        Column('updated_at', 'updated_at', 'timestamp'),
+    )
 
     id: uuid
     name: str
@@ -53,10 +90,20 @@ class Genre:
     def get_args(cls) -> str:
         return "%s, %s, %s, %s, %s"
 
+    @classmethod
+    def get_types(cls) -> tuple:
+        return tuple(column.type for column in cls.columns)
+
 
 @dataclass(frozen=True)
 class GenreFilmWork:
     __slots__ = ['id', 'filmwork_id', 'genre_id', 'created_at']
+    columns = (
+        Column('id', 'id', 'uuid'),
+        Column('film_work_id', 'filmwork_id', 'uuid'),
+        Column('genre_id', 'genre_id', 'uuid'),
+        Column('created_at', 'created_at', 'timestamp'),
+    )
 
     id: uuid
     filmwork_id: FilmWork
@@ -74,10 +121,21 @@ class GenreFilmWork:
     def get_args(cls) -> str:
         return "%s, %s, %s, %s"
 
+    @classmethod
+    def get_types(cls) -> tuple:
+        return tuple(column.type for column in cls.columns)
+
 
 @dataclass(frozen=True)
 class Person:
     __slots__ = ['id', 'full_name', 'birth_date', 'created_at', 'updated_at']
+    columns = (
+        Column('id', 'id', 'uuid'),
+        Column('full_name', 'full_name', 'text'),
+        Column('birth_date', 'birth_date', 'date'),
+        Column('created_at', 'created_at', 'timestamp'),
+        Column('updated_at', 'updated_at', 'timestamp'),
+    )
 
     id: uuid
     full_name: str
@@ -96,10 +154,21 @@ class Person:
     def get_args(cls) -> str:
         return "%s, %s, %s, %s, %s"
 
+    @classmethod
+    def get_types(cls) -> tuple:
+        return tuple(column.type for column in cls.columns)
+
 
 @dataclass(frozen=True)
 class PersonFilmWork:
     __slots__ = ['id', 'filmwork_id', 'person_id', 'role', 'created_at']
+    columns = (
+        Column('id', 'id', 'uuid'),
+        Column('film_work_id', 'filmwork_id', 'uuid'),
+        Column('person_id', 'person_id', 'uuid'),
+        Column('role', 'role', 'text'),
+        Column('created_at', 'created_at', 'timestamp'),
+    )
 
     id: uuid
     filmwork_id: FilmWork
@@ -116,4 +185,8 @@ class PersonFilmWork:
 
     @classmethod
     def get_args(cls) -> str:
-        return "%s, %s, %s, %s, %s"
\ No newline at end of file
+        return "%s, %s, %s, %s, %s"
+
+    @classmethod
+    def get_types(cls) -> tuple:
+        return tuple(column.type for column in cls.columns)
@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+from typing import Callable, Iterable
+
+from config import logging
+
+_DONE = object()
+
+
+class StageStats:
+    """Время работы стадии без учёта ожидания в очередях"""
+
+    def __init__(self, name: str, observer: Callable = None):
+        self.name = name
+        self.busy = 0.0
+        self.batches = 0
+        self.rows = 0
+        self.__observer = observer
+
+    def add(self, started: float, rows: int):
+        seconds = time.perf_counter() - started
+        self.busy += seconds
+        self.batches += 1
+        self.rows += rows
+        if self.__observer:
+            self.__observer(self.name, seconds, rows)
+
+    def __str__(self):
+        return f"{self.name}: {self.busy:.3f}s, {self.batches} пачек, {self.rows} строк"
+
+
+class Pipeline:
+    """Чтение -> преобразование -> запись, соединённые ограниченными очередями.
+
+    Чтение идёт в вызывающем потоке (соединение SQLite к нему привязано), преобразование
+    и запись - в отдельных потоках. Полная очередь блокирует предыдущую стадию, так что
+    в памяти одновременно не больше queue_size пачек на каждую очередь.
+    observer(stage, seconds, rows) вызывается после обработки каждой пачки каждой стадией.
+    """
+
+    def __init__(self, read: Iterable, transform: Callable, write: Callable, queue_size: int = 4,
+                 observer: Callable = None):
+        self.__read = read
+        self.__transform = transform
+        self.__write = write
+        self.__transformed = queue.Queue(maxsize=queue_size)
+        self.__to_write = queue.Queue(maxsize=queue_size)
+        self.__failed = threading.Event()
+        self.__errors = []
+        self.stats = [StageStats('read', observer), StageStats('transform', observer), StageStats('write', observer)]
+
+    def __put(self, target: queue.Queue, item) -> bool:
+        while not self.__failed.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __get(self, source: queue.Queue):
+        while not self.__failed.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def __fail(self, error: BaseException):
+        self.__errors.append(error)
+        self.__failed.set()
+
+    def __transform_stage(self):
+        stats = self.stats[1]
+        try:
+            while True:
+                item = self.__get(self.__transformed)
+                if item is _DONE:
+                    self.__put(self.__to_write, _DONE)
+                    return
+                key, rows = item
+                started = time.perf_counter()
+                values = self.__transform(rows)
+                stats.add(started, len(rows))
+                if not self.__put(self.__to_write, (key, values)):
+                    return
+        except BaseException as e:
+            self.__fail(e)
+
+    def __write_stage(self):
+        stats = self.stats[2]
+        try:
+            while True:
+                item = self.__get(self.__to_write)
+                if item is _DONE:
+                    return
+                key, values = item
+                started = time.perf_counter()
+                self.__write(key, values)
+                stats.add(started, len(values))
+        except BaseException as e:
+            self.__fail(e)
+
+    def run(self, name: str = ''):
+        threads = [
+            threading.Thread(target=self.__transform_stage, name=f"{name}-transform", daemon=True),
+            threading.Thread(target=self.__write_stage, name=f"{name}-write", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        stats = self.stats[0]
+        try:
+            batches = iter(self.__read)
+            while not self.__failed.is_set():
+                started = time.perf_counter()
+                try:
+                    key, rows = next(batches)
+                except StopIteration:
+                    break
+                stats.add(started, len(rows))
+                if not self.__put(self.__transformed, (key, rows)):
+                    break
+            self.__put(self.__transformed, _DONE)
+        except BaseException as e:
+            self.__fail(e)
+
+        for thread in threads:
+            thread.join()
+
+        bottleneck = max(self.stats, key=lambda stage: stage.busy)
+        logging.info(f"{name} - {'; '.join(str(stage) for stage in self.stats)}; узкое место: {bottleneck.name}")
+
+        if self.__errors:
+            raise self.__errors[0]
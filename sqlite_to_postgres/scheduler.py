@@ -0,0 +1,69 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable
+
+from config import logging
+
+
+class MigrationError(Exception):
+    pass
+
+
+def topological_order(dependencies: Dict[str, Iterable[str]]) -> list:
+    """Порядок задач, в котором каждая идёт после своих зависимостей"""
+    order = []
+    done = set()
+    visiting = set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise MigrationError(f"Циклическая зависимость таблиц: {name}")
+        if name not in dependencies:
+            raise MigrationError(f"Неизвестная таблица в зависимостях: {name}")
+        visiting.add(name)
+        for parent in dependencies[name]:
+            visit(parent)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in dependencies:
+        visit(name)
+    return order
+
+
+def run_graph(tasks: Dict[str, Callable[[], None]], dependencies: Dict[str, Iterable[str]], workers: int = 3):
+    """Выполняет задачи в пуле потоков: задача стартует, как только загружены все её зависимости.
+
+    При ошибке любой задачи новые задачи не запускаются, уже запущенные дожидаются,
+    а наружу поднимается MigrationError.
+    """
+    order = topological_order(dependencies)
+    remaining = {name: set(dependencies[name]) for name in order}
+    running = {}
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while remaining or running:
+            if not failed:
+                for name in [name for name in order if name in remaining and not remaining[name]]:
+                    del remaining[name]
+                    running[executor.submit(tasks[name])] = name
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    logging.error(f"Ошибка загрузки таблицы {name}: {error!r}")
+                    failed.append(name)
+                    continue
+                for parents in remaining.values():
+                    parents.discard(name)
+
+    if failed:
+        raise MigrationError(f"Миграция прервана, ошибки в таблицах: {', '.join(failed)}")
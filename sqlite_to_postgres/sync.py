@@ -0,0 +1,106 @@
+from contextlib import closing
+
+import psycopg2
+
+from config import logging
+from scheduler import topological_order
+
+# Колонки, которые не перезаписываются при обновлении существующей строки
+KEEP_ON_UPDATE = ('id', 'created_at')
+
+
+def staging_table(table: str) -> str:
+    return f"{table}_staging"
+
+
+def upsert_sql(table: str, model) -> str:
+    """Один INSERT ... SELECT из staging: новые строки вставляются, изменённые обновляются.
+
+    Для таблиц с updated_at строка обновляется, только если в источнике она новее.
+    У таблиц связей updated_at нет, для них обновляются строки, отличающиеся хоть одной колонкой.
+    """
+    columns = [column.target for column in model.columns]
+    fields = ', '.join(columns)
+    changed = [column for column in columns if column not in KEEP_ON_UPDATE]
+    updates = ', '.join(f"{column} = excluded.{column}" for column in changed)
+    if 'updated_at' in columns:
+        condition = "excluded.updated_at > target.updated_at"
+    else:
+        condition = (f"({', '.join(f'target.{column}' for column in changed)}) IS DISTINCT FROM "
+                     f"({', '.join(f'excluded.{column}' for column in changed)})")
+    return f"""
+        WITH upserted AS (
+            INSERT INTO content.{table} AS target ({fields})
+            SELECT {fields} FROM content.{staging_table(table)}
+            ON CONFLICT (id) DO UPDATE SET {updates}
+            WHERE {condition}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted;
+    """
+
+
+def delete_sql(table: str) -> str:
+    return f"""DELETE FROM content.{table} AS target
+               WHERE NOT EXISTS (SELECT 1 FROM content.{staging_table(table)} AS staging
+                                 WHERE staging.id = target.id);"""
+
+
+class Synchronizer:
+    """Режим синхронизации: повторная загрузка обновлённого источника без полной перезаливки.
+
+    prepare() создаёт для каждой таблицы пустую UNLOGGED-таблицу content.<таблица>_staging, куда
+    загрузчик пишет COPY весь источник (writer mode='stage'). apply() одной транзакцией переносит
+    изменения в целевые таблицы set-based запросами в порядке зависимостей, с delete_missing
+    удаляет строки, которых больше нет в источнике (сначала связи, потом родителей), и удаляет
+    staging-таблицы. Возвращает по каждой таблице число строк в источнике, вставленных,
+    обновлённых, неизменных и удалённых.
+    """
+
+    def __init__(self, dsl: dict, tables: dict, dependencies: dict, delete_missing: bool = False):
+        self.__dsl = dsl
+        self.tables = tables
+        self.order = topological_order(dependencies)
+        self.delete_missing = delete_missing
+
+    def __connect(self):
+        return closing(psycopg2.connect(**self.__dsl))
+
+    def prepare(self):
+        with self.__connect() as connection:
+            cursor = connection.cursor()
+            for table in self.order:
+                cursor.execute(f"""CREATE UNLOGGED TABLE IF NOT EXISTS content.{staging_table(table)}
+                                   (LIKE content.{table} INCLUDING DEFAULTS);""")
+                cursor.execute(f"TRUNCATE content.{staging_table(table)};")
+            connection.commit()
+
+    def apply(self) -> dict:
+        counts = {}
+        with self.__connect() as connection:
+            cursor = connection.cursor()
+            try:
+                for table in self.order:
+                    cursor.execute(f"SELECT count(*) FROM content.{staging_table(table)};")
+                    staged = cursor.fetchone()[0]
+                    cursor.execute(upsert_sql(table, self.tables[table]))
+                    inserted, updated = cursor.fetchone()
+                    counts[table] = {'source': staged, 'inserted': inserted, 'updated': updated,
+                                     'unchanged': staged - inserted - updated, 'deleted': 0}
+
+                if self.delete_missing:
+                    for table in reversed(self.order):
+                        cursor.execute(delete_sql(table))
+                        counts[table]['deleted'] = cursor.rowcount
+
+                for table in self.order:
+                    cursor.execute(f"DROP TABLE content.{staging_table(table)};")
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                logging.exception(f"Ошибка синхронизации, изменения откачены: {e}")
+                raise
+
+        for table, table_counts in counts.items():
+            logging.info(f"Синхронизация {table}: {table_counts}")
+        return counts
@@ -0,0 +1,66 @@
+"""Проверка кодировщиков COPY из copy_format.py.
+
+Сравнение текстового и бинарного форматов на настоящем Postgres требует переменной TEST_DB_DSN
+(хватит временной таблицы, отдельная база не создаётся). Запуск из каталога sqlite_to_postgres:
+
+    TEST_DB_DSN=postgresql://postgres@localhost/postgres python -m unittest test_copy_format
+"""
+import os
+import struct
+import unittest
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+from copy_format import BINARY_HEADER, PG_EPOCH, to_binary_buffer, to_text_buffer
+
+STAMPS = ['2021-06-16 20:14:09.221838+00', '2021-06-16 20:14:09.221838+03', '2021-06-16 20:14:09-05:30']
+UTC = [datetime(2021, 6, 16, 20, 14, 9, 221838), datetime(2021, 6, 16, 17, 14, 9, 221838),
+       datetime(2021, 6, 17, 1, 44, 9)]
+
+
+class TextFormatTest(unittest.TestCase):
+    def test_timestamp_offsets(self):
+        # в timestamp без часового пояса Postgres отбросил бы смещение, поэтому оно пересчитывается в UTC
+        lines = to_text_buffer([(value,) for value in STAMPS], ('timestamp',)).read().splitlines()
+        self.assertEqual([datetime.fromisoformat(line) for line in lines], UTC)
+
+
+class BinaryFormatTest(unittest.TestCase):
+    def test_timestamp_columns(self):
+        # две колонки timestamp идут через кешированный кодировщик
+        buffer = to_binary_buffer([(value, value) for value in STAMPS], ('timestamp', 'timestamp')).getvalue()
+        offset = len(BINARY_HEADER)
+        decoded = []
+        for _ in STAMPS:
+            count, = struct.unpack_from('!h', buffer, offset)
+            offset += 2
+            row = []
+            for _ in range(count):
+                size, micros = struct.unpack_from('!iq', buffer, offset)
+                offset += 4 + size
+                row.append(PG_EPOCH + timedelta(microseconds=micros))
+            decoded.append(tuple(row))
+        self.assertEqual(decoded, [(value, value) for value in UTC])
+
+
+@unittest.skipUnless(os.environ.get('TEST_DB_DSN'), 'нужна переменная TEST_DB_DSN')
+class CopyFormatsTest(unittest.TestCase):
+    def load(self, copy_format: str, buffer) -> list:
+        with closing(psycopg2.connect(**parse_dsn(os.environ['TEST_DB_DSN']))) as connection:
+            cursor = connection.cursor()
+            cursor.execute("CREATE TEMP TABLE stamps (at timestamp)")
+            cursor.copy_expert(f"COPY stamps FROM STDIN WITH (FORMAT {copy_format})", buffer)
+            cursor.execute("SELECT at FROM stamps")
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_timestamp_offsets(self):
+        rows = [(value,) for value in STAMPS]
+        self.assertEqual(self.load('text', to_text_buffer(rows, ('timestamp',))), UTC)
+        self.assertEqual(self.load('binary', to_binary_buffer(rows, ('timestamp',))), UTC)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Проверка режима синхронизации (--sync) на настоящем Postgres.
+
+Нужна переменная TEST_DB_DSN с правом CREATE DATABASE: тест создаёт отдельную базу со схемой
+из schema_design/db_schema.sql и удаляет её после себя. Без TEST_DB_DSN тесты пропускаются.
+Запуск из каталога sqlite_to_postgres:
+
+    TEST_DB_DSN=postgresql://postgres@localhost/postgres python -m unittest test_sync
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import uuid
+from contextlib import closing
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+from load_data import PostgresSaver, sync_parallel, table_dependencies, tables_models
+from models import source_fields
+from sync import Synchronizer, staging_table
+
+HERE = Path(__file__).resolve().parent
+SCHEMA = HERE.parent / 'schema_design' / 'db_schema.sql'
+SOURCE = HERE / 'db.sqlite'
+
+
+def execute(dsl: dict, statement: str, autocommit: bool = False):
+    with closing(psycopg2.connect(**dsl)) as connection:
+        connection.autocommit = autocommit
+        cursor = connection.cursor()
+        cursor.execute(statement)
+        rows = cursor.fetchall() if cursor.description else None
+        connection.commit()
+        return rows
+
+
+@unittest.skipUnless(os.environ.get('TEST_DB_DSN'), 'нужна переменная TEST_DB_DSN')
+class SyncTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = parse_dsn(os.environ['TEST_DB_DSN'])
+        cls.dbname = f"test_sync_{uuid.uuid4().hex[:8]}"
+        execute(cls.server, f"CREATE DATABASE {cls.dbname};", autocommit=True)
+        cls.dsl = {**cls.server, 'dbname': cls.dbname}
+        execute(cls.dsl, SCHEMA.read_text(encoding='utf-8'))
+
+    @classmethod
+    def tearDownClass(cls):
+        execute(cls.server, f"DROP DATABASE IF EXISTS {cls.dbname};", autocommit=True)
+
+    def setUp(self):
+        for table in reversed(list(tables_models)):
+            execute(self.dsl, f"TRUNCATE content.{table} CASCADE;")
+        self.tmp = tempfile.mkdtemp()
+        self.sqlite = os.path.join(self.tmp, 'db.sqlite')
+        shutil.copy(SOURCE, self.sqlite)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def source_count(self, table: str) -> int:
+        with closing(sqlite3.connect(self.sqlite)) as connection:
+            return connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+    def change_source(self, statement: str):
+        with closing(sqlite3.connect(self.sqlite)) as connection:
+            connection.execute(statement)
+            connection.commit()
+
+    def test_stage_writer(self):
+        table = 'genre'
+        model = tables_models[table]
+        Synchronizer(self.dsl, tables_models, table_dependencies).prepare()
+        with closing(sqlite3.connect(self.sqlite)) as connection:
+            rows = connection.execute(f"SELECT {source_fields(model)} FROM {table}").fetchall()
+
+        for copy_format in PostgresSaver.copy_formats:
+            with self.subTest(copy_format=copy_format), closing(psycopg2.connect(**self.dsl)) as connection:
+                execute(self.dsl, f"TRUNCATE content.{staging_table(table)};")
+                saver = PostgresSaver(connection, mode='stage', copy_format=copy_format)
+                saver.save_prepared(table, model, saver.prepare(model, rows))
+                staged = execute(self.dsl, f"SELECT count(*) FROM content.{staging_table(table)};")[0][0]
+                self.assertEqual(staged, len(rows))
+
+    def test_sync(self):
+        counts = sync_parallel(self.sqlite, self.dsl, workers=2, batch=500)
+        for table in tables_models:
+            with self.subTest(table=table):
+                self.assertEqual(counts[table]['inserted'], self.source_count(table))
+                self.assertEqual(counts[table]['updated'], 0)
+
+        counts = sync_parallel(self.sqlite, self.dsl, workers=2, batch=500)
+        for table in tables_models:
+            with self.subTest(table=table):
+                self.assertEqual(counts[table]['unchanged'], self.source_count(table))
+
+        self.change_source("UPDATE film_work SET title = 'changed', updated_at = '2100-01-01 00:00:00.000000+00' "
+                           "WHERE rowid = (SELECT min(rowid) FROM film_work)")
+        self.change_source("DELETE FROM person_film_work WHERE rowid = (SELECT min(rowid) FROM person_film_work)")
+        counts = sync_parallel(self.sqlite, self.dsl, workers=2, batch=500, delete_missing=True)
+        self.assertEqual(counts['film_work']['updated'], 1)
+        self.assertEqual(counts['person_film_work']['deleted'], 1)
+        self.assertEqual(execute(self.dsl, "SELECT count(*) FROM content.film_work WHERE title = 'changed';")[0][0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
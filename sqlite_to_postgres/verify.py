@@ -0,0 +1,266 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import psycopg2
+
+from config import env, logging
+from copy_format import parse_date, parse_timestamp
+from load_data import tables_models
+
+NULL = '\\N'
+SEPARATOR = '\x1f'
+HEX = '0123456789abcdef'
+
+# Одинаковое текстовое представление значений в Postgres и в Python
+PG_CANONICAL = {
+    'uuid': '{}::text',
+    'text': '{}',
+    'float8': '{}::text',
+    'date': "to_char({}, 'YYYY-MM-DD')",
+    'timestamp': "to_char({}, 'YYYY-MM-DD HH24:MI:SS.US')",
+}
+
+
+def _canonical_float(value) -> str:
+    value = float(value)
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+PY_CANONICAL = {
+    'uuid': lambda value: str(value).lower(),
+    'text': str,
+    'float8': _canonical_float,
+    'date': lambda value: parse_date(value).isoformat(),
+    'timestamp': lambda value: parse_timestamp(value).strftime('%Y-%m-%d %H:%M:%S.%f'),
+}
+
+
+def row_hash(*values) -> int:
+    """Первые 64 бита md5 от строки как знаковое целое - так же, как ::bit(64)::bigint в Postgres"""
+    value = int(hashlib.md5(SEPARATOR.join(values).encode('utf-8')).hexdigest()[:16], 16)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def prefix_bounds(prefix: str) -> tuple:
+    """Границы [low, high) диапазона uuid с заданным hex-префиксом; high=None - до конца"""
+    def as_uuid(digits: str) -> str:
+        digits = digits.ljust(32, '0')
+        return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+    if not prefix:
+        return as_uuid(''), None
+    following = int(prefix, 16) + 1
+    if following >= 16 ** len(prefix):
+        return as_uuid(prefix), None
+    return as_uuid(prefix), as_uuid(f"{following:0{len(prefix)}x}")
+
+
+class HashSum:
+    """Агрегат SQLite: сумма 64-битных хешей без переполнения, результат - текст"""
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, value):
+        self.total += value
+
+    def finalize(self):
+        return str(self.total)
+
+
+class SQLiteSide:
+    def __init__(self, path: str):
+        self.__path = path
+
+    def connect(self, model) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.__path)
+        converters = [PY_CANONICAL[column.type] for column in model.columns]
+
+        def canonical_hash(*values):
+            return row_hash(*(NULL if value is None else convert(value)
+                              for convert, value in zip(converters, values)))
+
+        connection.create_function('row_hash', len(converters), canonical_hash, deterministic=True)
+        connection.create_aggregate('hash_sum', 1, HashSum)
+        return connection
+
+    @staticmethod
+    def __range(low: str, high: str) -> tuple:
+        # id в SQLite хранятся строками в нижнем регистре, поэтому диапазон ищется по индексу id
+        if high is None:
+            return 'id >= ?', (low,)
+        return 'id >= ? AND id < ?', (low, high)
+
+    def bucket_hashes(self, table: str, model, prefix: str, length: int) -> dict:
+        where, args = self.__range(*prefix_bounds(prefix))
+        fields = ', '.join(column.source for column in model.columns)
+        with closing(self.connect(model)) as connection:
+            rows = connection.execute(
+                f"SELECT substr(replace(lower(id), '-', ''), 1, {length}), count(*), hash_sum(row_hash({fields})) "
+                f"FROM {table} WHERE {where} GROUP BY 1", args
+            ).fetchall()
+        return {bucket: (count, int(total)) for bucket, count, total in rows}
+
+    def row_hashes(self, table: str, model, prefix: str) -> dict:
+        where, args = self.__range(*prefix_bounds(prefix))
+        fields = ', '.join(column.source for column in model.columns)
+        with closing(self.connect(model)) as connection:
+            rows = connection.execute(f"SELECT lower(id), row_hash({fields}) FROM {table} WHERE {where}", args)
+            return dict(rows.fetchall())
+
+
+class PostgresSide:
+    def __init__(self, dsl: dict):
+        self.__dsl = dsl
+
+    @staticmethod
+    def __hash_expression(model) -> str:
+        values = ', '.join(
+            f"coalesce({PG_CANONICAL[column.type].format(column.target)}, '{NULL}')" for column in model.columns
+        )
+        return f"('x' || substr(md5(concat_ws(chr(31), {values})), 1, 16))::bit(64)::bigint"
+
+    @staticmethod
+    def __range(low: str, high: str) -> tuple:
+        if high is None:
+            return 'id >= %s::uuid', (low,)
+        return 'id >= %s::uuid AND id < %s::uuid', (low, high)
+
+    def __fetch(self, query: str, args: tuple) -> list:
+        with closing(psycopg2.connect(**self.__dsl)) as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, args)
+            return cursor.fetchall()
+
+    def bucket_hashes(self, table: str, model, prefix: str, length: int) -> dict:
+        where, args = self.__range(*prefix_bounds(prefix))
+        rows = self.__fetch(
+            f"SELECT left(replace(id::text, '-', ''), {length}), count(*), sum({self.__hash_expression(model)}) "
+            f"FROM content.{table} WHERE {where} GROUP BY 1", args
+        )
+        return {bucket: (count, int(total)) for bucket, count, total in rows}
+
+    def row_hashes(self, table: str, model, prefix: str) -> dict:
+        where, args = self.__range(*prefix_bounds(prefix))
+        rows = self.__fetch(f"SELECT id::text, {self.__hash_expression(model)} FROM content.{table} WHERE {where}",
+                            args)
+        return dict(rows)
+
+
+class Verifier:
+    """Сверка SQLite и Postgres по хешам диапазонов id.
+
+    Таблица делится на диапазоны по hex-префиксу uuid, для каждого диапазона на обеих
+    сторонах считаются число строк и сумма хешей строк (не зависит от порядка). Совпавшие
+    диапазоны отбрасываются, несовпавшие дробятся дальше, пока в диапазоне не останется
+    не больше leaf_rows строк - тогда сравниваются хеши отдельных строк.
+    """
+
+    def __init__(self, source: SQLiteSide, target: PostgresSide, workers: int = 4, leaf_rows: int = 1000,
+                 top_length: int = 2):
+        self.source = source
+        self.target = target
+        self.workers = workers
+        self.leaf_rows = leaf_rows
+        self.top_length = top_length
+
+    def verify_table(self, table: str, model) -> dict:
+        report = {'source_rows': 0, 'target_rows': 0, 'ranges_checked': 0, 'missing': [], 'extra': [],
+                  'mismatched': []}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # первый проход: по одному диапазону на каждую первую hex-цифру
+            first = list(executor.map(lambda digit: self.__compare(table, model, digit, self.top_length), HEX))
+
+            pending = []
+            for buckets in first:
+                for bucket, source, target in buckets:
+                    report['source_rows'] += source[0]
+                    report['target_rows'] += target[0]
+                    report['ranges_checked'] += 1
+                    if source != target:
+                        pending.append((bucket, source, target))
+
+            while pending:
+                results = list(executor.map(lambda item: self.__drill(table, model, *item), pending))
+                pending = []
+                for checked, children, diff in results:
+                    report['ranges_checked'] += checked
+                    pending.extend(children)
+                    for key in ('missing', 'extra', 'mismatched'):
+                        report[key].extend(diff[key])
+
+        for key in ('missing', 'extra', 'mismatched'):
+            report[key].sort()
+        return report
+
+    def __compare(self, table: str, model, prefix: str, length: int) -> list:
+        source = self.source.bucket_hashes(table, model, prefix, length)
+        target = self.target.bucket_hashes(table, model, prefix, length)
+        empty = (0, 0)
+        return [(bucket, source.get(bucket, empty), target.get(bucket, empty)) for bucket in set(source) | set(target)]
+
+    def __drill(self, table: str, model, prefix: str, source: tuple, target: tuple) -> tuple:
+        diff = {'missing': [], 'extra': [], 'mismatched': []}
+        if max(source[0], target[0]) <= self.leaf_rows or len(prefix) >= 32:
+            source_rows = self.source.row_hashes(table, model, prefix)
+            target_rows = self.target.row_hashes(table, model, prefix)
+            diff['missing'] = [key for key in source_rows if key not in target_rows]
+            diff['extra'] = [key for key in target_rows if key not in source_rows]
+            diff['mismatched'] = [key for key, value in source_rows.items()
+                                  if key in target_rows and target_rows[key] != value]
+            return 0, [], diff
+
+        children = [item for item in self.__compare(table, model, prefix, len(prefix) + 1) if item[1] != item[2]]
+        return len(children), children, diff
+
+    def verify(self, tables: dict = None) -> dict:
+        report = {}
+        for table, model in (tables or tables_models).items():
+            report[table] = self.verify_table(table, model)
+            result = report[table]
+            logging.info(f"Сверка {table}: SQLite {result['source_rows']}, Postgres {result['target_rows']}, "
+                         f"нет в Postgres {len(result['missing'])}, лишних {len(result['extra'])}, "
+                         f"отличаются {len(result['mismatched'])}")
+        return report
+
+
+def has_differences(report: dict) -> bool:
+    return any(result['missing'] or result['extra'] or result['mismatched'] for result in report.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Сверка данных SQLite и PostgreSQL после загрузки')
+    parser.add_argument('--sqlite', default='db.sqlite')
+    parser.add_argument('--dsn', default=None, help='строка подключения, по умолчанию из DB_* переменных')
+    parser.add_argument('--workers', type=int, default=4, help='число диапазонов, сверяемых одновременно')
+    parser.add_argument('--leaf-rows', type=int, default=1000, help='размер диапазона для построчного сравнения')
+    parser.add_argument('--table', action='append', choices=tables_models, help='сверить только эти таблицы')
+    parser.add_argument('--output', default='verify.json', help='куда сохранить отчёт')
+    args = parser.parse_args()
+
+    if args.dsn:
+        dsl = {'dsn': args.dsn}
+    else:
+        dsl = {
+            'dbname': env('DB_NAME'),
+            'user': env('DB_USER'),
+            'password': env('DB_PASSWORD'),
+            'host': env('DB_HOST'),
+            'port': env('DB_PORT')
+        }
+
+    tables = {table: tables_models[table] for table in args.table} if args.table else None
+    verifier = Verifier(SQLiteSide(args.sqlite), PostgresSide(dsl), args.workers, args.leaf_rows)
+    result = verifier.verify(tables)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+
+    sys.exit(1 if has_differences(result) else 0)